@@ -1,34 +1,113 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, send_file
 from flask_cors import CORS 
 import torch
-import pandas as pd
 from werkzeug.utils import secure_filename
 import os
 import torch.nn.functional as F
-from transformers import RobertaTokenizer, RobertaForSequenceClassification, pipeline
-from scraper import scrape_booking_reviews 
+from transformers import AutoTokenizer, pipeline
+from scraper import iter_booking_review_pages
+from batcher import MicroBatcher, length_buckets
+from driver_pool import DriverPool, PoolTimeout
+from jobs import JobStore
+from file_analysis import CSV_ERRORS, RESULT_FORMATS, ResultWriter, has_review_column, iter_review_chunks, remove_quietly
+from engines import load_engine
+from models import MemoryBudget, ModelSlot, ModelUnavailable, start_idle_reaper, start_warmup
+from model_memory import load_sequence_classifier, module_memory, process_memory, release_memory
+from limits import BoundedExecutor, ConcurrencyLimiter, DomainRateLimiter, Overloaded
+from scrape_cache import ScrapeCache, url_key
+import metrics
+from metrics import stage
+from caching import AnnotationCache, LRUCache, file_fingerprint, text_key
+from review_store import ReviewStore
+from near_duplicates import NearDuplicateIndex
+from aspect_head import AspectHead, CascadeStats, embed_texts, load_encoder, train_head
+import click
+import cProfile
+import functools
+import gc
+import hashlib
+import json
+import random
+import time
+import queue
 import re
+import tempfile
+import threading
+from collections import namedtuple
 
 app = Flask(__name__)
 CORS(app) 
 
+# Set by gunicorn.conf.py: models are loaded in the master process before the workers are forked,
+# and per-process background threads are started in each worker (see preload_models / after_fork).
+PREFORK_SERVER = os.environ.get('SERVER_PREFORK', '0') != '0'
+
 # --- MODEL 1: Your fine-tuned Fake/Real Classifier ---
 MODEL_PATH = './final_model_distilroberta'
-print("Loading the saved models and tokenizers...")
-try:
-    # Your existing model for fake vs. real prediction
-    fake_review_tokenizer = RobertaTokenizer.from_pretrained(MODEL_PATH)
-    fake_review_model = RobertaForSequenceClassification.from_pretrained(MODEL_PATH)
-    fake_review_model.eval()
-
-    # --- MODEL 2: Zero-Shot Model for Aspect & Sentiment Analysis ---
-    print("Loading Zero-Shot classification pipeline...")
-    zero_shot_classifier = pipeline("zero-shot-classification", model="facebook/bart-large-mnli")
-    
-    print("All models loaded successfully!")
-except Exception as e:
-    print(f"Error loading models: {e}")
-    exit()
+ZERO_SHOT_MODEL = os.environ.get('ZERO_SHOT_MODEL', 'facebook/bart-large-mnli')
+# Inference backend for the classifier: "torch" (default), "onnx" or "onnx-int8" (see engines.py)
+INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND', 'torch')
+
+# --- Memory budget (see model_memory.py) ---
+# Zero-shot weights in "fp32", "bf16" or "int8" (dynamically quantized Linear layers).
+ZERO_SHOT_DTYPE = os.environ.get('ZERO_SHOT_DTYPE', 'fp32')
+# Memory-map safetensors weights instead of copying them onto the heap.
+MODEL_MMAP = os.environ.get('MODEL_MMAP', '0') != '0'
+# Unload a model after this many idle seconds (0 keeps models resident); it reloads on next use.
+MODEL_IDLE_UNLOAD_SECONDS = float(os.environ.get('MODEL_IDLE_UNLOAD_SECONDS', 0))
+# Upper bound for the heap-resident weights of all models together (0 disables the budget).
+MODEL_MEMORY_BUDGET_MB = float(os.environ.get('MODEL_MEMORY_BUDGET_MB', 0))
+
+
+def _load_classifier():
+    # The Rust-backed fast tokenizer is used on the hot path.
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_PATH, use_fast=True)
+    engine = load_engine(INFERENCE_BACKEND, MODEL_PATH, use_mmap=MODEL_MMAP)
+    print(f"Fake/real classifier running on the '{engine.name}' backend.")
+    # Prediction cache keys include a fingerprint of the model files and backend.
+    fingerprint = file_fingerprint(MODEL_PATH, extra=INFERENCE_BACKEND)
+    return Classifier(tokenizer, engine, fingerprint)
+
+
+# --- MODEL 2: Zero-Shot Model for Aspect & Sentiment Analysis ---
+def _load_zero_shot():
+    model = load_sequence_classifier(ZERO_SHOT_MODEL, dtype=ZERO_SHOT_DTYPE, use_mmap=MODEL_MMAP)
+    tokenizer = AutoTokenizer.from_pretrained(ZERO_SHOT_MODEL)
+    print(f"Zero-shot model loaded with {ZERO_SHOT_DTYPE} weights{' (memory-mapped)' if getattr(model, 'mmap_bytes', 0) else ''}.")
+    return pipeline("zero-shot-classification", model=model, tokenizer=tokenizer)
+
+
+# Models load lazily on first use, or in a background warm-up thread so Flask can bind right away.
+# The small classifier is loaded first, so /predict is ready while the zero-shot model is still loading.
+Classifier = namedtuple('Classifier', ['tokenizer', 'engine', 'fingerprint'])
+classifier_slot = ModelSlot(
+    'fake_review_classifier', _load_classifier,
+    idle_unload_seconds=MODEL_IDLE_UNLOAD_SECONDS,
+    # ONNX engines hold no PyTorch module; their load_rss_delta_bytes still shows their footprint.
+    sizer=lambda classifier: module_memory(getattr(classifier.engine, 'model', None)),
+)
+zero_shot_slot = ModelSlot(
+    'zero_shot_classifier', _load_zero_shot,
+    idle_unload_seconds=MODEL_IDLE_UNLOAD_SECONDS,
+    sizer=lambda zero_shot: module_memory(zero_shot.model),
+)
+model_budget = None
+if MODEL_MEMORY_BUDGET_MB > 0:
+    model_budget = MemoryBudget([classifier_slot, zero_shot_slot], max_bytes=int(MODEL_MEMORY_BUDGET_MB * 1024 * 1024))
+
+WARMUP_ON_IMPORT = os.environ.get('WARMUP_ON_IMPORT', '1') != '0'
+
+
+def start_background_threads():
+    """Starts this process's model warm-up and idle reaper threads. Threads do not survive a fork."""
+    if WARMUP_ON_IMPORT:
+        start_warmup([slot for slot in (classifier_slot, zero_shot_slot) if not slot.available])
+    if MODEL_IDLE_UNLOAD_SECONDS > 0:
+        start_idle_reaper([classifier_slot, zero_shot_slot], interval=min(30, MODEL_IDLE_UNLOAD_SECONDS))
+
+
+if not PREFORK_SERVER:
+    start_background_threads()
 
 LABELS = ['fake', 'real']
 
@@ -132,9 +211,6 @@ ASPECT_LABELS = [
 ]
 SENTIMENT_LABELS = ['positive feedback', 'negative feedback']
 
-# --- Cache for storing consensus maps to improve performance and consistency ---
-_consensus_cache = {}
-
 # --- Helper function to split reviews ---
 def split_review_into_clauses(review_text):
     """Splits a review by conjunctions and punctuation to analyze parts separately."""
@@ -142,72 +218,430 @@ def split_review_into_clauses(review_text):
     return [clause.strip() for clause in clauses if clause and clause.strip()]
 
 
-# --- Helper function using the transformer pipeline ---
+# --- Batched zero-shot (NLI) annotation ---
+NLI_BATCH_SIZE = int(os.environ.get('NLI_BATCH_SIZE', 32))
+# Upper bound for requests annotated synchronously (/cross-check-batch, POST /hotels/<name>/reviews):
+# every clause or review costs one NLI forward per label.
+CROSS_CHECK_MAX_REVIEWS = int(os.environ.get('CROSS_CHECK_MAX_REVIEWS', 100))
+HYPOTHESIS_TEMPLATE = "This example is {}."
+
+# --- Persistent annotation cache (memory LRU + SQLite), keyed by text, model and label-set version ---
+ANNOTATION_CACHE_PATH = os.environ.get('ANNOTATION_CACHE_PATH', './cache/annotations.sqlite3')
+LABEL_SET_VERSION = hashlib.sha256(json.dumps([ASPECT_LABELS, SENTIMENT_LABELS, HYPOTHESIS_TEMPLATE]).encode('utf-8')).hexdigest()[:16]
+annotation_cache = AnnotationCache(
+    ANNOTATION_CACHE_PATH,
+    # int8 and bf16 weights can label differently from fp32, so the dtype is part of the namespace.
+    namespace=f"{ZERO_SHOT_MODEL}:{ZERO_SHOT_DTYPE}:{LABEL_SET_VERSION}",
+    max_memory_items=int(os.environ.get('ANNOTATION_CACHE_SIZE', 10000)),
+)
+
+# --- Persistent hotel/review store with incremental per-aspect sentiment counters ---
+# The demo hotels above are seeded on startup (see below); reviews added later come from the API and scrapes.
+REVIEW_DB_PATH = os.environ.get('REVIEW_DB_PATH', './cache/reviews.sqlite3')
+review_store = ReviewStore(REVIEW_DB_PATH, namespace=annotation_cache.namespace)
+
+
+def _annotate_texts(texts, batch_size=NLI_BATCH_SIZE):
+    """
+    Scores every (text x label) premise/hypothesis pair for both ASPECT_LABELS and SENTIMENT_LABELS
+    in batched forwards of the zero-shot model. Pairs are bucketed by token length before padding.
+    Returns one dict per text with the top aspect, top sentiment and the per-label scores.
+    """
+    if not texts:
+        return []
+    zero_shot_classifier = zero_shot_slot.get(wait=False)
+    tokenizer = zero_shot_classifier.tokenizer
+    model = zero_shot_classifier.model
+    entailment_id = zero_shot_classifier.entailment_id
+
+    all_labels = ASPECT_LABELS + SENTIMENT_LABELS
+    hypotheses = [HYPOTHESIS_TEMPLATE.format(label) for label in all_labels]
+    premises = [text for text in texts for _ in hypotheses]
+    with stage('nli_tokenize'):
+        encodings = tokenizer(premises, hypotheses * len(texts), truncation='only_first')
+
+    entailment_logits = torch.empty(len(premises))
+    for bucket, inputs in length_buckets(tokenizer, encodings, batch_size):
+        with stage('nli_forward'), torch.no_grad():
+            logits = model(**inputs.to(model.device)).logits
+        entailment_logits[bucket] = logits[:, entailment_id].float().cpu()
+
+    entailment_logits = entailment_logits.view(len(texts), len(all_labels))
+    aspect_probs = F.softmax(entailment_logits[:, :len(ASPECT_LABELS)], dim=1)
+    sentiment_probs = F.softmax(entailment_logits[:, len(ASPECT_LABELS):], dim=1)
+
+    annotations = []
+    for aspect_row, sentiment_row in zip(aspect_probs.tolist(), sentiment_probs.tolist()):
+        annotations.append({
+            'aspect': ASPECT_LABELS[aspect_row.index(max(aspect_row))],
+            'sentiment': SENTIMENT_LABELS[sentiment_row.index(max(sentiment_row))],
+            'scores': {
+                'aspect': dict(zip(ASPECT_LABELS, aspect_row)),
+                'sentiment': dict(zip(SENTIMENT_LABELS, sentiment_row)),
+            },
+        })
+    return annotations
+
+
+# --- Cascade: a distilled aspect/sentiment head answers confident clauses, zero-shot the rest ---
+# The head is trained offline by `flask --app app distill-aspect-head` from cached zero-shot
+# annotations. Without a head file, every clause goes through the zero-shot model as before.
+ASPECT_HEAD_PATH = os.environ.get('ASPECT_HEAD_PATH', os.path.join(MODEL_PATH, 'heads', 'aspect_head.joblib'))
+ASPECT_CASCADE_ENABLED = os.environ.get('ASPECT_CASCADE', '1') != '0'
+ASPECT_HEAD_THRESHOLD = float(os.environ.get('ASPECT_HEAD_THRESHOLD', 0.9))
+ASPECT_HEAD_SHADOW_RATE = float(os.environ.get('ASPECT_HEAD_SHADOW_RATE', 0.02))
+FastAnnotator = namedtuple('FastAnnotator', ['head', 'tokenizer', 'encoder'])
+
+
+def _load_aspect_head():
+    if not os.path.exists(ASPECT_HEAD_PATH):
+        print(f"No aspect head at {ASPECT_HEAD_PATH}; cross-checks use the zero-shot model only.")
+        return None
+    head = AspectHead.load(ASPECT_HEAD_PATH)
+    if head.metadata.get('label_set_version') != LABEL_SET_VERSION:
+        print("The aspect head was trained for a different label set; ignoring it. Re-run distill-aspect-head.")
+        return None
+    if head.metadata.get('encoder_fingerprint') != file_fingerprint(MODEL_PATH):
+        print("The aspect head was trained on a different encoder; ignoring it. Re-run distill-aspect-head.")
+        return None
+    classifier = classifier_slot.get()
+    return FastAnnotator(head, classifier.tokenizer, load_encoder(classifier.engine, MODEL_PATH))
+
+
+aspect_head_slot = ModelSlot('aspect_head', _load_aspect_head)
+# The head holds the classifier's encoder, so it has to go when the classifier is unloaded.
+classifier_slot.dependents.append(aspect_head_slot)
+cascade_stats = CascadeStats()
+# Fast-path annotations are only kept in memory; the SQLite tier holds zero-shot labels, which
+# are also the distillation training data.
+fast_annotation_cache = LRUCache(max_items=int(os.environ.get('ANNOTATION_CACHE_SIZE', 10000)))
+
+
+def _fast_annotator():
+    """The loaded aspect head, or None if the cascade is off or no usable head is available."""
+    if not ASPECT_CASCADE_ENABLED:
+        return None
+    try:
+        return aspect_head_slot.get(wait=False)
+    except ModelUnavailable:
+        return None
+
+
+def _fast_annotation_key(annotator, text):
+    # Keyed on the head's training time too, so a retrained head never serves the old head's labels.
+    return text_key(text, f"{annotation_cache.namespace}:{annotator.head.metadata.get('trained_at')}")
+
+
+def _fast_annotate(annotator, texts):
+    """Returns {text: (annotation, confidence)} from the aspect head, or {} without one."""
+    if annotator is None or not texts:
+        return {}
+    embeddings = embed_texts(annotator.encoder, annotator.tokenizer, texts, batch_size=PREDICT_BATCH_SIZE)
+    with stage('aspect_head_predict'):
+        return dict(zip(texts, annotator.head.predict(embeddings)))
+
+
+def _shadow_compare(items):
+    """Runs the zero-shot model on a sample of fast-path annotations to measure agreement."""
+    texts = [text for text, _ in items]
+    full = dict(zip(texts, _annotate_texts(texts)))
+    annotation_cache.put_many(full)
+    for text, fast_annotation in items:
+        cascade_stats.record_comparison('shadow', fast_annotation, full[text])
+    return [None] * len(items)
+
+
+shadow_batcher = MicroBatcher(_shadow_compare, max_batch_size=NLI_BATCH_SIZE, max_wait_ms=200, name="aspect-shadow")
+
+
+def _cascade_annotate(texts, annotator, batch_size=NLI_BATCH_SIZE):
+    """
+    Annotates texts with the aspect head (`annotator`, may be None) where its confidence reaches
+    ASPECT_HEAD_THRESHOLD and with the zero-shot model otherwise. Returns {text: annotation}.
+    """
+    fast = _fast_annotate(annotator, texts)
+    scored = {}
+    remaining = []
+    for text in texts:
+        result = fast.get(text)
+        if result is not None and result[1] >= ASPECT_HEAD_THRESHOLD:
+            scored[text] = result[0]
+            fast_annotation_cache.put(_fast_annotation_key(annotator, text), result[0])
+        else:
+            remaining.append(text)
+    if fast:
+        cascade_stats.record_paths(fast=len(scored), fallback=len(remaining))
+        if ASPECT_HEAD_SHADOW_RATE > 0:
+            for text, annotation in scored.items():
+                if random.random() < ASPECT_HEAD_SHADOW_RATE:
+                    shadow_batcher.submit((text, annotation))
+
+    if remaining:
+        full = dict(zip(remaining, _annotate_texts(remaining, batch_size=batch_size)))
+        annotation_cache.put_many(full)
+        for text in remaining:
+            if text in fast:
+                cascade_stats.record_comparison('fallback', fast[text][0], full[text])
+        scored.update(full)
+    return scored
+
+
+def get_annotations(review_texts, batch_size=NLI_BATCH_SIZE, allow_fast=True):
+    """
+    Returns {text: annotation} for the given texts. Cached annotations are reused; only
+    texts that are new to the cache are scored, once each. With allow_fast, confident texts are
+    scored by the distilled aspect head instead of the zero-shot model.
+    """
+    unique_texts = list(dict.fromkeys(review_texts))
+    annotations = annotation_cache.get_many(unique_texts)
+    annotator = _fast_annotator() if allow_fast and len(annotations) < len(unique_texts) else None
+
+    # Texts that normalize to the same cache key are scored once.
+    pending = {}
+    for text in unique_texts:
+        if text in annotations:
+            continue
+        cached = fast_annotation_cache.get(_fast_annotation_key(annotator, text)) if annotator is not None else None
+        if cached is not None:
+            annotations[text] = cached
+        else:
+            pending.setdefault(annotation_cache.key(text), []).append(text)
+    if pending:
+        representatives = [texts[0] for texts in pending.values()]
+        if allow_fast:
+            scored = _cascade_annotate(representatives, annotator, batch_size=batch_size)
+        else:
+            scored = dict(zip(representatives, _annotate_texts(representatives, batch_size=batch_size)))
+            annotation_cache.put_many(scored)
+        for texts in pending.values():
+            for text in texts:
+                annotations[text] = scored[texts[0]]
+    return annotations
+
+
+def analyze_reviews_aspect_and_sentiment(review_texts, batch_size=NLI_BATCH_SIZE):
+    """
+    Determines the primary aspect and sentiment of many texts at once.
+    Identical texts are only scored once. Returns an (aspect, sentiment) tuple per text, in order.
+    """
+    annotations = get_annotations(review_texts, batch_size=batch_size)
+    return [(annotations[text]['aspect'], annotations[text]['sentiment']) for text in review_texts]
+
+
 def analyze_review_aspect_and_sentiment(review_text):
     """
     Uses a zero-shot classification model to determine the primary aspect and sentiment of a review.
     """
-    aspect_result = zero_shot_classifier(review_text, candidate_labels=ASPECT_LABELS)
-    top_aspect = aspect_result['labels'][0]
-    sentiment_result = zero_shot_classifier(review_text, candidate_labels=SENTIMENT_LABELS)
-    top_sentiment = sentiment_result['labels'][0]
-    return top_aspect, top_sentiment
+    return analyze_reviews_aspect_and_sentiment([review_text])[0]
 
-# --- Your existing prediction function (no changes) ---
-def predict_review(review_text):
-    inputs = fake_review_tokenizer(review_text, return_tensors="pt", padding=True, truncation=True, max_length=256)
-    with torch.no_grad():
-        outputs = fake_review_model(**inputs)
-    logits = outputs.logits
-    probabilities = F.softmax(logits, dim=1)
-    prediction_index = torch.argmax(probabilities, dim=1).item()
-    predicted_label = LABELS[prediction_index]
-    confidence_score = probabilities[0][prediction_index].item() * 100 
-    return predicted_label, confidence_score
+# --- Batched fake/real prediction ---
+PREDICT_BATCH_SIZE = int(os.environ.get('PREDICT_BATCH_SIZE', 32))
+# Upper bounds for /predict-batch, so one request cannot force a huge padded forward pass.
+PREDICT_BATCH_SIZE_LIMIT = int(os.environ.get('PREDICT_BATCH_SIZE_LIMIT', 128))
+PREDICT_BATCH_MAX_REVIEWS = int(os.environ.get('PREDICT_BATCH_MAX_REVIEWS', 1000))
 
 
-# --- API Endpoint now uses caching ---
-@app.route('/cross-check-review', methods=['POST'])
-def handle_cross_check():
-    data = request.get_json()
-    if not data or 'hotel_name' not in data or 'review_text' not in data:
-        return jsonify({'error': 'Request must include "hotel_name" and "review_text"'}), 400
+def _classify_inputs(classifier, inputs):
+    """Runs the classifier over already-tokenized inputs and returns (label, confidence) per row."""
+    with stage('classifier_forward'):
+        logits = classifier.engine.predict_logits(inputs)
+    with stage('classifier_softmax'):
+        probabilities = F.softmax(logits, dim=1)
+    confidences, prediction_indices = torch.max(probabilities, dim=1)
+    return [(LABELS[index], confidence * 100) for index, confidence in zip(prediction_indices.tolist(), confidences.tolist())]
 
-    hotel_name = data['hotel_name']
-    new_review_text = data['review_text']
 
-    if hotel_name not in existing_reviews_db:
-        return jsonify({'verdict': 'INCONCLUSIVE', 'reason': f'Not enough data for "{hotel_name}" to perform a cross-check.'}), 200
+def _predict_batch(review_texts):
+    """Runs one padded forward pass over a list of texts and returns (label, confidence) per text."""
+    classifier = classifier_slot.get()
+    with stage('classifier_tokenize'):
+        inputs = classifier.tokenizer(review_texts, return_tensors="pt", padding=True, truncation=True, max_length=256)
+    return _classify_inputs(classifier, inputs)
+
+
+def _predict_reviews_uncached(review_texts, batch_size=PREDICT_BATCH_SIZE):
+    """
+    Classifies many reviews at once and returns (label, confidence) per review in the original order.
+    Reviews are bucketed by token length so each batch is only padded to its own longest review.
+    """
+    review_texts = list(review_texts)
+    if not review_texts:
+        return []
+    classifier = classifier_slot.get()
+
+    with stage('classifier_tokenize'):
+        encodings = classifier.tokenizer(review_texts, truncation=True, max_length=256)
+
+    results = [None] * len(review_texts)
+    for bucket, inputs in length_buckets(classifier.tokenizer, encodings, batch_size, pad_stage='classifier_pad'):
+        for i, result in zip(bucket, _classify_inputs(classifier, inputs)):
+            results[i] = result
+    return results
+
+
+# --- Prediction cache: repeated review texts skip the classifier ---
+prediction_cache = LRUCache(
+    max_items=int(os.environ.get('PREDICTION_CACHE_SIZE', 50000)),
+    ttl_seconds=float(os.environ.get('PREDICTION_CACHE_TTL', 3600)) or None,
+)
+
+
+def _prediction_key(classifier, review_text):
+    return text_key(review_text, classifier.fingerprint)
+
+
+def predict_reviews(review_texts, batch_size=PREDICT_BATCH_SIZE):
+    """
+    Classifies many reviews at once and returns (label, confidence) per review in the original order.
+    Cached texts are answered from the prediction cache; the rest are deduplicated and batched.
+    """
+    review_texts = list(review_texts)
+    classifier = classifier_slot.get(wait=False)
+    keys = [_prediction_key(classifier, text) for text in review_texts]
+    results = [prediction_cache.get(key) for key in keys]
+
+    pending = {}
+    for i, (key, result) in enumerate(zip(keys, results)):
+        if result is None:
+            pending.setdefault(key, []).append(i)
+    if pending:
+        representatives = [review_texts[indices[0]] for indices in pending.values()]
+        for (key, indices), result in zip(pending.items(), _predict_reviews_uncached(representatives, batch_size=batch_size)):
+            prediction_cache.put(key, result)
+            for i in indices:
+                results[i] = result
+    return results
+
 
-    # --- CACHING LOGIC ---
-    if hotel_name in _consensus_cache:
-        consensus_map = _consensus_cache[hotel_name]
+# --- Near-duplicate clusters: templated, lightly edited reviews are grouped and classified once ---
+near_duplicate_index = NearDuplicateIndex(
+    os.environ.get('NEAR_DUPLICATE_DB_PATH', './cache/near_duplicates.sqlite3'),
+    threshold=float(os.environ.get('NEAR_DUPLICATE_THRESHOLD', 0.7)),
+    min_chars=int(os.environ.get('NEAR_DUPLICATE_MIN_CHARS', 40)),
+)
+# Off by default: clusters merge transitively, so a reused label may come from a text that is not
+# itself a near-duplicate of the review being classified.
+NEAR_DUPLICATE_REUSE = os.environ.get('NEAR_DUPLICATE_REUSE', '0') != '0'
+
+# Seeded reviews are indexed like every other stored review (see add_hotel_reviews).
+for _hotel_name, _reviews in existing_reviews_db.items():
+    _seeded = review_store.add_reviews(_hotel_name, _reviews, source='seed')
+    if _seeded:
+        near_duplicate_index.add_many([text for _, text in _seeded], source='store')
+near_duplicate_reused = metrics.REGISTRY.counter(
+    'verisure_near_duplicate_reused_total',
+    'Predictions answered from an already classified near-duplicate cluster instead of the model.',
+)
+
+
+def predict_reviews_with_clusters(review_texts, source, batch_size=PREDICT_BATCH_SIZE):
+    """
+    Like predict_reviews, but also indexes the texts for near-duplicate detection. Returns
+    (label, confidence, cluster_id, cluster_size) per review. Members of a cluster that already
+    has a prediction reuse it, and only one member of each new cluster goes through the model.
+    """
+    review_texts = list(review_texts)
+    classifier = classifier_slot.get(wait=False)
+    with stage('near_duplicate_lookup'):
+        clusters = near_duplicate_index.add_many(review_texts, source=source, model=classifier.fingerprint)
+
+    predictions = [None] * len(review_texts)
+    groups = {}
+    for i, (cluster_id, _, stored) in enumerate(clusters):
+        if NEAR_DUPLICATE_REUSE and stored is not None:
+            predictions[i] = stored
+        else:
+            groups.setdefault(cluster_id if NEAR_DUPLICATE_REUSE and cluster_id is not None else ('row', i), []).append(i)
+    if len(groups) < len(review_texts):
+        near_duplicate_reused.inc(len(review_texts) - len(groups))
+
+    representatives = [indices[0] for indices in groups.values()]
+    new_predictions = {}
+    for indices, result in zip(groups.values(), predict_reviews([review_texts[i] for i in representatives], batch_size=batch_size)):
+        for i in indices:
+            predictions[i] = result
+        if clusters[indices[0]][0] is not None:
+            new_predictions[clusters[indices[0]][0]] = result
+    near_duplicate_index.set_predictions(new_predictions, model=classifier.fingerprint)
+
+    return [
+        (label, confidence, cluster_id, cluster_size)
+        for (label, confidence), (cluster_id, cluster_size, _) in zip(predictions, clusters)
+    ]
+
+
+# --- Micro-batching: concurrent /predict calls are coalesced into one forward pass ---
+MICRO_BATCHING_ENABLED = os.environ.get('MICRO_BATCHING', '1') != '0'
+prediction_batcher = MicroBatcher(
+    _predict_batch,
+    max_batch_size=int(os.environ.get('BATCH_MAX_SIZE', 32)),
+    max_wait_ms=float(os.environ.get('BATCH_MAX_WAIT_MS', 5)),
+    name="predict-batcher",
+)
+
+
+def predict_review(review_text):
+    classifier = classifier_slot.get(wait=False)
+    key = _prediction_key(classifier, review_text)
+    result = prediction_cache.get(key)
+    if result is not None:
+        return result
+    if MICRO_BATCHING_ENABLED:
+        result = prediction_batcher(review_text)
     else:
-        print(f"--- Building new consensus cache for {hotel_name} ---")
-        consensus_map = {}
-        for review in existing_reviews_db[hotel_name]:
-            aspect, sentiment = analyze_review_aspect_and_sentiment(review['review'])
-            if aspect not in consensus_map:
-                consensus_map[aspect] = []
-            consensus_map[aspect].append(sentiment)
-        _consensus_cache[hotel_name] = consensus_map
-        print(f"--- Cache for {hotel_name} built: {consensus_map} ---")
-    # --- END CACHING LOGIC ---
+        result = _predict_batch([review_text])[0]
+    prediction_cache.put(key, result)
+    return result
+
+
+# --- Cross-check helpers ---
+def annotate_pending_reviews(hotel_name=None):
+    """
+    Annotates stored reviews that have no annotation yet and updates the hotel counters.
+    Stored labels always come from the zero-shot model: the store's namespace tracks only that
+    model and the label set, so head labels would outlive a retrained or disabled head.
+    """
+    pending = review_store.pending_reviews(hotel_name)
+    if not pending:
+        return 0
+    with stage('consensus_update'):
+        annotations = get_annotations([text for _, text in pending], allow_fast=False)
+        review_store.record_annotations(
+            (review_id, annotations[text]['aspect'], annotations[text]['sentiment']) for review_id, text in pending
+        )
+    return len(pending)
 
-    clauses = split_review_into_clauses(new_review_text)
-    if not clauses:
-        return jsonify({'verdict': 'INCONCLUSIVE', 'reason': 'Review text is too short to analyze.'}), 200
 
+def add_hotel_reviews(hotel_name, reviews, source='api'):
+    """Stores new reviews for a hotel and folds their annotations into its consensus counters."""
+    added = review_store.add_reviews(hotel_name, reviews, source=source)
+    annotate_pending_reviews(hotel_name)
+    if added:
+        near_duplicate_index.add_many([text for _, text in added], source='store')
+    return len(added)
+
+
+def _get_consensus_map(hotel_name):
+    """
+    Returns {aspect: (positive_count, negative_count)} for a hotel, or None if the hotel is unknown.
+    Counters are kept up to date as reviews are added, so this is a lookup, not a rebuild; only
+    reviews that are still waiting for an annotation are scored first.
+    """
+    if not review_store.has_hotel(hotel_name):
+        return None
+    annotate_pending_reviews(hotel_name)
+    return review_store.consensus(hotel_name)
+
+
+def _cross_check_clauses(clauses, clause_annotations, consensus_map):
+    """Compares each clause's (aspect, sentiment) with the hotel consensus and builds the response body."""
     analysis_results = []
     is_outlier_found = False
 
-    for clause in clauses:
-        clause_aspect, clause_sentiment = analyze_review_aspect_and_sentiment(clause)
+    for clause, (clause_aspect, clause_sentiment) in zip(clauses, clause_annotations):
 
         if clause_aspect in consensus_map:
-            sentiments = consensus_map[clause_aspect]
-            positive_count = sentiments.count('positive feedback')
-            negative_count = len(sentiments) - positive_count
+            positive_count, negative_count = consensus_map[clause_aspect]
             
             is_clause_outlier = False
             reason = ""
@@ -243,25 +677,261 @@ def handle_cross_check():
 
 
     if not analysis_results:
-        return jsonify({'verdict': 'INCONCLUSIVE', 'reason': 'Could not identify specific aspects in the review.'}), 200
+        return {'verdict': 'INCONCLUSIVE', 'reason': 'Could not identify specific aspects in the review.'}
 
     if is_outlier_found:
         overall_verdict = "FAKE_REVIEW"
     else:
         overall_verdict = "GENUINE_REVIEW"
         
-    return jsonify({
+    return {
         "overall_verdict": overall_verdict,
         "analysis": analysis_results
+    }
+
+
+# --- Backpressure: bounded concurrency per worker ---
+request_limiter = ConcurrencyLimiter(
+    max_active=int(os.environ.get('WORKER_MAX_CONCURRENCY', 4)),
+    max_waiting=int(os.environ.get('WORKER_MAX_QUEUE', 8)),
+    wait_timeout=float(os.environ.get('WORKER_QUEUE_TIMEOUT', 30)),
+    name='requests',
+)
+# /predict calls mostly wait on the micro-batcher, so they get their own, larger limit: with no
+# more slots than WORKER_MAX_CONCURRENCY, a micro-batch could never grow past that many reviews.
+predict_limiter = ConcurrencyLimiter(
+    max_active=int(os.environ.get(
+        'PREDICT_MAX_CONCURRENCY', prediction_batcher.max_batch_size if MICRO_BATCHING_ENABLED else request_limiter.max_active,
+    )),
+    max_waiting=int(os.environ.get('PREDICT_MAX_QUEUE', 8)),
+    wait_timeout=float(os.environ.get('WORKER_QUEUE_TIMEOUT', 30)),
+    name='predict',
+)
+
+
+def _too_busy(message, retry_after=2):
+    response = jsonify({'error': message})
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 429
+
+
+def _unavailable(message, retry_after=10):
+    response = jsonify({'error': message})
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 503
+
+
+def limit_concurrency(view=None, limiter=None):
+    """
+    Runs an inference endpoint under `limiter` (request_limiter by default) and answers 429 when
+    the worker's queue is full. Streamed responses keep their slot until the stream is closed.
+    Use as @limit_concurrency or @limit_concurrency(limiter=...).
+    """
+    if view is None:
+        return functools.partial(limit_concurrency, limiter=limiter)
+    limiter = limiter or request_limiter
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not limiter.acquire():
+            return _too_busy('The server is busy. Please try again shortly.')
+        try:
+            response = app.make_response(view(*args, **kwargs))
+        except BaseException:
+            limiter.release()
+            raise
+        if response.is_streamed:
+            response.call_on_close(limiter.release)
+        else:
+            limiter.release()
+        return response
+    return wrapper
+
+
+# --- API Endpoint now uses caching ---
+@app.route('/cross-check-review', methods=['POST'])
+@limit_concurrency
+def handle_cross_check():
+    data = request.get_json()
+    if not data or 'hotel_name' not in data or 'review_text' not in data:
+        return jsonify({'error': 'Request must include "hotel_name" and "review_text"'}), 400
+
+    hotel_name = data['hotel_name']
+    new_review_text = data['review_text']
+
+    consensus_map = _get_consensus_map(hotel_name)
+    if consensus_map is None:
+        return jsonify({'verdict': 'INCONCLUSIVE', 'reason': f'Not enough data for "{hotel_name}" to perform a cross-check.'}), 200
+
+    clauses = split_review_into_clauses(new_review_text)
+    if not clauses:
+        return jsonify({'verdict': 'INCONCLUSIVE', 'reason': 'Review text is too short to analyze.'}), 200
+
+    # All clauses of the review are scored in one batched NLI pass.
+    with stage('cross_check_clauses'):
+        clause_annotations = analyze_reviews_aspect_and_sentiment(clauses)
+    return jsonify(_cross_check_clauses(clauses, clause_annotations, consensus_map))
+
+
+@app.route('/cross-check-batch', methods=['POST'])
+@limit_concurrency
+def handle_cross_check_batch():
+    data = request.get_json(silent=True)
+    if not data or 'hotel_name' not in data or not isinstance(data.get('reviews'), list):
+        return jsonify({'error': 'Request must include "hotel_name" and a "reviews" list'}), 400
+    if not all(isinstance(review, str) for review in data['reviews']):
+        return jsonify({'error': 'Every item in "reviews" must be a string.'}), 400
+    if len(data['reviews']) > CROSS_CHECK_MAX_REVIEWS:
+        return jsonify({'error': f'At most {CROSS_CHECK_MAX_REVIEWS} reviews per request.'}), 400
+
+    hotel_name = data['hotel_name']
+    consensus_map = _get_consensus_map(hotel_name)
+    if consensus_map is None:
+        return jsonify({'verdict': 'INCONCLUSIVE', 'reason': f'Not enough data for "{hotel_name}" to perform a cross-check.'}), 200
+
+    # Clauses from every review are deduplicated and scored together in one batched NLI pass.
+    clauses_per_review = [split_review_into_clauses(review) for review in data['reviews']]
+    all_clauses = [clause for clauses in clauses_per_review for clause in clauses]
+    annotations = dict(zip(all_clauses, analyze_reviews_aspect_and_sentiment(all_clauses)))
+
+    results = []
+    for clauses in clauses_per_review:
+        if not clauses:
+            results.append({'verdict': 'INCONCLUSIVE', 'reason': 'Review text is too short to analyze.'})
+            continue
+        results.append(_cross_check_clauses(clauses, [annotations[clause] for clause in clauses], consensus_map))
+    return jsonify({'hotel_name': hotel_name, 'results': results})
+
+
+# --- Hotel review ingestion ---
+def _parse_review_items(items):
+    """Accepts review strings or {"review": ..., "user": ...} objects; returns dicts or None if invalid."""
+    reviews = []
+    for item in items:
+        if isinstance(item, str):
+            item = {'review': item}
+        if not isinstance(item, dict) or not isinstance(item.get('review'), str):
+            return None
+        if item['review'].strip():
+            reviews.append({'review': item['review'], 'user': item.get('user')})
+    return reviews
+
+
+@app.route('/hotels/<hotel_name>/reviews', methods=['POST'])
+@limit_concurrency
+def handle_add_hotel_reviews(hotel_name):
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('reviews'), list):
+        return jsonify({'error': 'Request must include a "reviews" list'}), 400
+    if len(data['reviews']) > CROSS_CHECK_MAX_REVIEWS:
+        return jsonify({'error': f'At most {CROSS_CHECK_MAX_REVIEWS} reviews per request.'}), 400
+    reviews = _parse_review_items(data['reviews'])
+    if reviews is None:
+        return jsonify({'error': 'Every item in "reviews" must be a string or an object with a "review" string.'}), 400
+
+    added = add_hotel_reviews(hotel_name, reviews, source='api')
+    return jsonify(dict(
+        review_store.hotel_summary(hotel_name),
+        added=added,
+        duplicates=len(reviews) - added,
+    )), 201
+
+
+@app.route('/hotels/<hotel_name>', methods=['GET'])
+def handle_get_hotel(hotel_name):
+    summary = review_store.hotel_summary(hotel_name)
+    if summary is None:
+        return jsonify({'error': f'No reviews stored for "{hotel_name}".'}), 404
+    consensus = review_store.consensus(hotel_name)
+    summary['consensus'] = {
+        aspect: {'positive': positive, 'negative': negative} for aspect, (positive, negative) in consensus.items()
+    }
+    return jsonify(summary)
+
+
+# Storing scraped reviews annotates them with the zero-shot model, so it runs on a small bounded
+# pool instead of a thread per scrape.
+ingest_executor = BoundedExecutor(
+    max_workers=int(os.environ.get('INGEST_WORKERS', 1)),
+    max_queue=int(os.environ.get('INGEST_QUEUE_SIZE', 8)),
+    name='review-ingest',
+)
+
+
+def _ingest_scraped_reviews(hotel_name, review_texts):
+    """
+    Adds scraped reviews to a hotel in the background, so the scrape response is not delayed. When
+    the ingest queue is full the reviews are not stored; the scrape itself still succeeds.
+    """
+    def ingest():
+        try:
+            added = add_hotel_reviews(hotel_name, [{'review': text} for text in review_texts], source='scrape')
+            print(f"Stored {added} new scraped reviews for {hotel_name}.")
+        except Exception as e:
+            print(f"Could not store scraped reviews for {hotel_name}: {e}")
+
+    try:
+        ingest_executor.submit(ingest)
+    except Overloaded:
+        print(f"Skipped storing {len(review_texts)} scraped reviews for {hotel_name}: the ingest queue is full.")
+
+
+# --- Model load state ---
+@app.errorhandler(ModelUnavailable)
+def _model_unavailable(e):
+    response = jsonify({'error': str(e), 'models': _model_status()})
+    response.headers['Retry-After'] = '5'
+    return response, 503
+
+
+def _model_status():
+    return {slot.name: slot.status() for slot in (classifier_slot, zero_shot_slot)}
+
+
+@app.route('/memory', methods=['GET'])
+def handle_memory():
+    """Process memory and, per model, weight bytes, dtypes, memory-mapped bytes and RSS growth at load."""
+    return jsonify({
+        'process': process_memory(),
+        'budget_bytes': model_budget.max_bytes if model_budget is not None else None,
+        'budget_used_bytes': model_budget.used_bytes() if model_budget is not None else None,
+        'zero_shot_dtype': ZERO_SHOT_DTYPE,
+        'mmap': MODEL_MMAP,
+        'models': {slot.name: slot.memory_report() for slot in (classifier_slot, zero_shot_slot)},
     })
 
 
+@app.route('/healthz', methods=['GET'])
+def handle_healthz():
+    # Liveness: the process is up and serving, whatever state the models are in.
+    return jsonify({'status': 'ok', 'models': _model_status()})
+
+
+@app.route('/readyz', methods=['GET'])
+def handle_readyz():
+    # Readiness: /predict can be served once the classifier is loaded; cross-checks also need the zero-shot model.
+    # A model unloaded to save memory still counts, since it reloads on the next request.
+    body = {
+        'ready': classifier_slot.available,
+        'endpoints': {
+            'predict': classifier_slot.available,
+            'cross_check': zero_shot_slot.available,
+        },
+        'models': _model_status(),
+    }
+    return jsonify(body), (200 if classifier_slot.available else 503)
+
+
 # --- Existing API Endpoints 
 @app.route('/predict', methods=['POST'])
+@limit_concurrency(limiter=predict_limiter)
 def handle_prediction():
     if not request.json or 'review' not in request.json:
         return jsonify({'error': 'Invalid request. Please provide a JSON with a "review" key.'}), 400
     review_text = request.json['review']
+    # Checked before the review joins a micro-batch shared with other requests.
+    if not isinstance(review_text, str) or not review_text.strip():
+        return jsonify({'error': '"review" must be a non-empty string.'}), 400
     try:
         prediction, confidence_score = predict_review(review_text)
         response_data = {
@@ -269,60 +939,898 @@ def handle_prediction():
             'confidence_score': f"{confidence_score:.2f}%"
         }
         return jsonify(response_data)
+    except ModelUnavailable as e:
+        return _model_unavailable(e)
     except Exception as e:
         print(f"Error during prediction: {e}")
         return jsonify({'error': 'Failed to process the review.'}), 500
     
+@app.route('/predict-batch', methods=['POST'])
+@limit_concurrency
+def handle_batch_prediction():
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('reviews'), list):
+        return jsonify({'error': 'Invalid request. Please provide a JSON with a "reviews" list.'}), 400
+    reviews = data['reviews']
+    if not all(isinstance(review, str) for review in reviews):
+        return jsonify({'error': 'Every item in "reviews" must be a string.'}), 400
+    if len(reviews) > PREDICT_BATCH_MAX_REVIEWS:
+        return jsonify({'error': f'At most {PREDICT_BATCH_MAX_REVIEWS} reviews per request; use /analyze-file for more.'}), 400
+    try:
+        batch_size = min(max(1, int(data.get('batch_size', PREDICT_BATCH_SIZE))), PREDICT_BATCH_SIZE_LIMIT)
+    except (TypeError, ValueError):
+        return jsonify({'error': '"batch_size" must be an integer.'}), 400
+    try:
+        predictions = predict_reviews(reviews, batch_size=batch_size)
+        results = []
+        for prediction, confidence_score in predictions:
+            results.append({
+                'prediction': prediction.upper(),
+                'confidence_score': f"{confidence_score:.2f}%"
+            })
+        return jsonify(results)
+    except ModelUnavailable as e:
+        return _model_unavailable(e)
+    except Exception as e:
+        print(f"Error during batch prediction: {e}")
+        return jsonify({'error': 'Failed to process the reviews.'}), 500
+
+@app.route('/batch-stats', methods=['GET'])
+def handle_batch_stats():
+    stats = prediction_batcher.stats()
+    stats['enabled'] = MICRO_BATCHING_ENABLED
+    return jsonify(stats)
+
+# --- Shared pool of headless browsers for scraping ---
+driver_pool = DriverPool(
+    size=int(os.environ.get('SCRAPER_POOL_SIZE', 2)),
+    max_uses=int(os.environ.get('SCRAPER_MAX_USES', 20)),
+    acquire_timeout=float(os.environ.get('SCRAPER_ACQUIRE_TIMEOUT', 60)),
+)
+
+# Scrapes run on their own bounded pool, so slow browsers never hold the threads that serve inference.
+scrape_executor = BoundedExecutor(
+    max_workers=int(os.environ.get('SCRAPE_WORKERS', driver_pool.size)),
+    max_queue=int(os.environ.get('SCRAPE_QUEUE_SIZE', 4)),
+    name='scrape',
+)
+
+# Reviews a scrape returns by default, and the most one may ask for.
+SCRAPE_MAX_REVIEWS = 50
+SCRAPE_MAX_REVIEWS_LIMIT = int(os.environ.get('SCRAPE_MAX_REVIEWS_LIMIT', 500))
+
+# --- Scraped-review cache and per-site pacing ---
+# Entries keep no more reviews than a scrape may ask for, so refreshes do not grow them forever.
+scrape_cache = ScrapeCache(
+    os.environ.get('SCRAPE_CACHE_PATH', './cache/scrapes.sqlite3'),
+    ttl_seconds=float(os.environ.get('SCRAPE_CACHE_TTL', 3600)),
+    max_reviews=SCRAPE_MAX_REVIEWS_LIMIT,
+)
+# Page loads per second allowed per site across all workers on the host, with small bursts. The
+# buckets are kept next to the scrape cache.
+domain_rate_limiter = DomainRateLimiter(
+    scrape_cache.db_path,
+    rate=float(os.environ.get('SCRAPE_DOMAIN_RATE', 0.5)),
+    burst=int(os.environ.get('SCRAPE_DOMAIN_BURST', 2)),
+)
+
+# --- Pipelined scraping: each page is classified while the next one is loading ---
+# Cached reviews a refresh must see in a row before it trusts that the rest are cached too.
+SCRAPE_REFRESH_OVERLAP = max(1, int(os.environ.get('SCRAPE_REFRESH_OVERLAP', 5)))
+_END_OF_PAGES = object()
+
+
+class _ScrapeCancelled(Exception):
+    """Stops a scrape whose consumer has gone away."""
+
+
+def _scrape_review_pages(url, max_reviews, refresh, emit):
+    """
+    Passes pages of {'review': ...} dicts to emit(page) and returns (source, new_reviews), where
+    new_reviews counts the scraped reviews that were not cached yet. A fresh cached copy is served
+    without a browser ('cache'). A stale one that was scraped newest first is refreshed by scraping
+    only the reviews newer than it ('refresh'), as long as the page can still be sorted newest first
+    and the scrape runs into SCRAPE_REFRESH_OVERLAP cached reviews in a row. Otherwise the URL is
+    scraped from the start and replaces the cached copy ('scrape'). `refresh` skips the fresh-cache
+    shortcut.
+    """
+    entry = scrape_cache.get(url)
+    covers = entry is not None and (entry['complete'] or len(entry['reviews']) >= max_reviews)
+    if covers and entry['fresh'] and not refresh:
+        scrape_cache.record('hit')
+        emit([{'review': review} for review in entry['reviews'][:max_reviews]])
+        return 'cache', 0
+    # A cached copy with fewer reviews than asked for cannot be extended from its end, and one in
+    # Booking's default order cannot be extended from its front, so those are re-scraped.
+    known = entry['reviews'] if covers and entry['newest_first'] else []
+    scrape_cache.record('refresh' if known else 'miss')
+
+    scraped = []
+    scrape_summary = {}
+    with driver_pool.lease() as driver:
+        for page_reviews in iter_booking_review_pages(
+            url, max_reviews=max_reviews, driver=driver, stop_at=set(known), stop_after=SCRAPE_REFRESH_OVERLAP,
+            before_request=lambda: domain_rate_limiter.acquire(url), summary=scrape_summary,
+        ):
+            scraped.extend(review['review'] for review in page_reviews)
+            emit(page_reviews)
+
+    incremental = bool(known) and scrape_summary.get('stopped_at_known', False)
+    if incremental:
+        seen = set(scraped)
+        older = [review for review in known if review not in seen]
+        emit([{'review': review} for review in older[:max_reviews - len(scraped)]])
+        reviews, complete = scraped + older, entry['complete']
+    else:
+        # Scraped from the start: the cached copy is replaced, not merged. It only holds every review
+        # if the scrape reached the last page; one that timed out or failed is cached as partial.
+        reviews, complete = scraped, scrape_summary.get('reached_end', False)
+    if reviews:
+        scrape_cache.put(url, reviews, complete, newest_first=scrape_summary.get('newest_first', False))
+    known_set = set(known)
+    return ('refresh' if incremental else 'scrape'), sum(review not in known_set for review in scraped)
+
+
+def _format_scrape_result(review_text, prediction, confidence_score, cluster_id, cluster_size):
+    return {
+        'review_text': review_text[:100] + "...",
+        'prediction': prediction.upper(),
+        'confidence_score': f"{confidence_score:.2f}%",
+        'near_duplicate_cluster': cluster_id,
+        'cluster_size': cluster_size,
+    }
+
+
+def scrape_and_classify(url, max_reviews=SCRAPE_MAX_REVIEWS, on_page=None, hotel_name=None, refresh=False, summary=None):
+    """
+    Scrapes a hotel's reviews in a background thread and classifies each page as soon as it
+    arrives, so inference overlaps with loading the next page. Calls on_page(page_results, page_number)
+    after every page and returns all results. With a hotel_name, the scraped reviews are also
+    added to that hotel in the review store. Reviews come from the scrape cache when possible
+    (see _scrape_review_pages); `summary`, if given, receives 'source' and 'new_reviews'.
+    """
+    pages = queue.Queue()
+    stop = threading.Event()
+
+    def emit(page_reviews):
+        if page_reviews:
+            pages.put(page_reviews)
+        if stop.is_set():
+            raise _ScrapeCancelled()
+
+    def produce():
+        try:
+            source, new_reviews = _scrape_review_pages(url, max_reviews, refresh, emit)
+            if summary is not None:
+                summary.update(source=source, new_reviews=new_reviews)
+        except _ScrapeCancelled:
+            pass
+        except Exception as e:
+            pages.put(e)
+        finally:
+            pages.put(_END_OF_PAGES)
+
+    threading.Thread(target=produce, name="scrape-producer", daemon=True).start()
+
+    all_results = []
+    scraped_texts = []
+    page_number = 0
+    try:
+        while True:
+            item = pages.get()
+            if item is _END_OF_PAGES:
+                break
+            if isinstance(item, Exception):
+                raise item
+            page_number += 1
+            review_texts = [review['review'] for review in item]
+            scraped_texts.extend(review_texts)
+            page_results = [
+                _format_scrape_result(review_text, *result)
+                for review_text, result in zip(review_texts, predict_reviews_with_clusters(review_texts, source='scrape'))
+            ]
+            all_results.extend(page_results)
+            if on_page is not None:
+                on_page(page_results, page_number)
+    finally:
+        stop.set()
+    if hotel_name and scraped_texts:
+        _ingest_scraped_reviews(hotel_name, scraped_texts)
+    return all_results
+
+
 @app.route('/scrape-and-predict', methods=['POST'])
 def handle_scraping():
     if not request.json or 'url' not in request.json:
         return jsonify({'error': 'Invalid request. Please provide a "url" key.'}), 400
     target_url = request.json['url']
     try:
-        reviews_df = scrape_booking_reviews(target_url, max_reviews=50)
-        if reviews_df.empty:
+        results = scrape_executor.submit(
+            scrape_and_classify, target_url, max_reviews=SCRAPE_MAX_REVIEWS, hotel_name=request.json.get('hotel_name'),
+            refresh=bool(request.json.get('refresh')),
+        ).result()
+        if not results:
             return jsonify({'error': 'Could not scrape any reviews from the URL.'}), 404
-        results = []
-        for review_text in reviews_df['review']:
-            prediction, confidence_score = predict_review(review_text)
-            results.append({
-                'review_text': review_text[:100] + "...",
-                'prediction': prediction.upper(),
-                'confidence_score': f"{confidence_score:.2f}%"
-            })
         print("Scraping and analysis complete.")
         return jsonify(results)
+    except Overloaded:
+        return _too_busy('Too many scrapes are running or queued. Please try again shortly.', retry_after=30)
+    except PoolTimeout:
+        return _unavailable('All scraper browsers are busy. Please try again shortly.')
+    except ModelUnavailable as e:
+        return _model_unavailable(e)
     except Exception as e:
         print(f"An error occurred during scraping/analysis: {e}")
         return jsonify({'error': 'An internal error occurred.'}), 500
 
-@app.route('/analyze-file', methods=['POST'])
-def analyze_file():
+
+# --- Asynchronous scrape jobs ---
+scrape_jobs = JobStore(
+    max_jobs=int(os.environ.get('JOB_STORE_SIZE', 200)),
+    ttl_seconds=float(os.environ.get('JOB_TTL_SECONDS', 3600)),
+)
+
+
+def _run_scrape_job(job):
+    job.start()
+    url = job.params['url']
+    job.update_progress(pages=0, classified=0)
+
+    def on_page(page_results, page_number):
+        job.add_results(page_results)
+        job.update_progress(pages=page_number, classified=len(job.results))
+
+    try:
+        results = scrape_and_classify(
+            url, max_reviews=job.params['max_reviews'], on_page=on_page, hotel_name=job.params.get('hotel_name'),
+            refresh=job.params.get('refresh', False),
+        )
+        job.finish(error=None if results else 'Could not scrape any reviews from the URL.')
+        print(f"Scrape job {job.id} complete: {len(results)} reviews.")
+    except PoolTimeout:
+        job.finish(error='All scraper browsers are busy. Please try again shortly.')
+    except Exception as e:
+        print(f"An error occurred during scrape job {job.id}: {e}")
+        job.finish(error=str(e))
+
+
+def _parse_max_reviews(value):
+    try:
+        return min(max(1, int(value)), SCRAPE_MAX_REVIEWS_LIMIT)
+    except (TypeError, ValueError):
+        return None
+
+
+@app.route('/scrape-jobs', methods=['POST'])
+def handle_create_scrape_job():
+    data = request.get_json(silent=True)
+    if not data or 'url' not in data:
+        return jsonify({'error': 'Invalid request. Please provide a "url" key.'}), 400
+    max_reviews = _parse_max_reviews(data.get('max_reviews', SCRAPE_MAX_REVIEWS))
+    if max_reviews is None:
+        return jsonify({'error': '"max_reviews" must be an integer.'}), 400
+
+    job = scrape_jobs.create('scrape', {
+        'url': data['url'], 'max_reviews': max_reviews, 'hotel_name': data.get('hotel_name'), 'refresh': bool(data.get('refresh')),
+    })
+    try:
+        scrape_executor.submit(_run_scrape_job, job)
+    except Overloaded:
+        job.finish(error='Too many scrapes are running or queued.')
+        return _too_busy('Too many scrapes are running or queued. Please try again shortly.', retry_after=30)
+    return jsonify({
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': f"/scrape-jobs/{job.id}",
+        'stream_url': f"/scrape-jobs/{job.id}/stream",
+    }), 202
+
+
+# --- Multi-URL scrape batches ---
+SCRAPE_BATCH_MAX_URLS = int(os.environ.get('SCRAPE_BATCH_MAX_URLS', 100))
+# A batch runs as up to this many tasks ("lanes") on the scrape executor, each scraping the batch's
+# URLs one after another. Lanes share the executor's workers, and so its browsers, with every other scrape.
+SCRAPE_BATCH_CONCURRENCY = max(1, int(os.environ.get('SCRAPE_BATCH_CONCURRENCY', scrape_executor.max_workers)))
+
+
+class _ScrapeBatch:
+    """The URLs of one /scrape-batch job still to be scraped, and its progress, shared by its lanes."""
+
+    def __init__(self, job, lanes):
+        self.job = job
+        self.pending = queue.Queue()
+        for index, target in enumerate(job.params['targets']):
+            self.pending.put((index, target))
+        self.summaries = [dict(target, status='queued') for target in job.params['targets']]
+        self.lanes = lanes
+        self.done = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        job.update_progress(urls_total=len(self.summaries), urls_done=0, urls_failed=0, urls=list(self.summaries))
+
+    def record(self, index, summary):
+        with self._lock:
+            self.summaries[index] = summary
+            self.done += 1
+            self.failed += int(summary['status'] == 'failed')
+            self.job.update_progress(urls_done=self.done, urls_failed=self.failed, urls=list(self.summaries))
+
+    def lane_finished(self):
+        """Called once per lane, including lanes the executor turned away; the last one finishes the job."""
+        with self._lock:
+            self.lanes -= 1
+            if self.lanes:
+                return
+            done, failed, total = self.done, self.failed, len(self.summaries)
+        self.job.finish(error='Could not scrape any of the URLs.' if failed == total else None)
+        print(f"Scrape batch {self.job.id} complete: {done - failed}/{total} hotels, {len(self.job.results)} reviews.")
+
+
+def _scrape_batch_target(job, target):
+    """Scrapes and classifies one hotel of a batch and returns its summary."""
+    url = target['url']
+    summary = {'url': url, 'hotel_name': target.get('hotel_name')}
+
+    def on_page(page_results, page_number):
+        job.add_results([dict(result, url=url) for result in page_results])
+
+    try:
+        results = scrape_and_classify(
+            url, max_reviews=job.params['max_reviews'], on_page=on_page, hotel_name=target.get('hotel_name'),
+            refresh=job.params['refresh'], summary=summary,
+        )
+        summary['reviews'] = len(results)
+        summary['error'] = None if results else 'Could not scrape any reviews from the URL.'
+    except PoolTimeout:
+        summary['error'] = 'All scraper browsers are busy.'
+    except Exception as e:
+        print(f"An error occurred while scraping {url} for batch {job.id}: {e}")
+        summary['error'] = str(e)
+    summary['status'] = 'failed' if summary['error'] else 'done'
+    return summary
+
+
+def _run_scrape_batch_lane(batch):
+    batch.job.start()
+    try:
+        while True:
+            try:
+                index, target = batch.pending.get_nowait()
+            except queue.Empty:
+                break
+            batch.record(index, _scrape_batch_target(batch.job, target))
+    finally:
+        batch.lane_finished()
+
+
+def _parse_scrape_targets(urls):
+    """[{'url', 'hotel_name'}, ...] from a list of URLs or {"url", "hotel_name"} objects, or None if malformed."""
+    targets = []
+    seen = set()
+    for item in urls:
+        target = {'url': item} if isinstance(item, str) else item
+        if not isinstance(target, dict) or not isinstance(target.get('url'), str) or not target['url'].strip():
+            return None
+        key = url_key(target['url'])
+        if key not in seen:
+            seen.add(key)
+            targets.append({'url': target['url'].strip(), 'hotel_name': target.get('hotel_name')})
+    return targets
+
+
+@app.route('/scrape-batch', methods=['POST'])
+def handle_create_scrape_batch():
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('urls'), list) or not data['urls']:
+        return jsonify({'error': 'Invalid request. Please provide a non-empty "urls" list.'}), 400
+    targets = _parse_scrape_targets(data['urls'])
+    if targets is None:
+        return jsonify({'error': 'Every item in "urls" must be a URL or an object with a "url" key.'}), 400
+    if len(targets) > SCRAPE_BATCH_MAX_URLS:
+        return jsonify({'error': f'At most {SCRAPE_BATCH_MAX_URLS} URLs per batch.'}), 400
+    max_reviews = _parse_max_reviews(data.get('max_reviews', SCRAPE_MAX_REVIEWS))
+    if max_reviews is None:
+        return jsonify({'error': '"max_reviews" must be an integer.'}), 400
+
+    job = scrape_jobs.create('scrape-batch', {'targets': targets, 'max_reviews': max_reviews, 'refresh': bool(data.get('refresh'))})
+    lanes = min(len(targets), SCRAPE_BATCH_CONCURRENCY)
+    batch = _ScrapeBatch(job, lanes)
+    try:
+        scrape_executor.submit(_run_scrape_batch_lane, batch)
+    except Overloaded:
+        job.finish(error='Too many scrapes are running or queued.')
+        return _too_busy('Too many scrapes are running or queued. Please try again shortly.', retry_after=30)
+    # Further lanes only run if the executor has room; the first one works through the URLs on its own.
+    for _ in range(lanes - 1):
+        try:
+            scrape_executor.submit(_run_scrape_batch_lane, batch)
+        except Overloaded:
+            batch.lane_finished()
+    return jsonify({
+        'job_id': job.id,
+        'status': job.status,
+        'urls': len(targets),
+        'status_url': f"/scrape-jobs/{job.id}",
+        'stream_url': f"/scrape-jobs/{job.id}/stream",
+    }), 202
+
+
+@app.route('/scrape-jobs/<job_id>', methods=['GET'])
+def handle_get_scrape_job(job_id):
+    job = scrape_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': f'No job with id "{job_id}".'}), 404
+    offset = request.args.get('offset', 0, type=int)
+    return jsonify(job.snapshot(offset=max(0, offset)))
+
+
+@app.route('/scrape-jobs/<job_id>/stream', methods=['GET'])
+def handle_stream_scrape_job(job_id):
+    job = scrape_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': f'No job with id "{job_id}".'}), 404
+
+    def generate():
+        # NDJSON: one result per line as it is classified, heartbeats while idle, final status last.
+        for event, payload in job.follow():
+            if event == 'result':
+                yield json.dumps(dict(payload, type='result')) + "\n"
+            elif event == 'status':
+                yield json.dumps(dict(payload, type='status')) + "\n"
+            else:
+                yield json.dumps({'type': 'heartbeat'}) + "\n"
+
+    return Response(generate(), mimetype='application/x-ndjson', headers={'X-Accel-Buffering': 'no', 'Cache-Control': 'no-cache'})
+
+# --- Bulk CSV analysis ---
+ANALYZE_CHUNK_SIZE = int(os.environ.get('ANALYZE_CHUNK_SIZE', 5000))
+RESULTS_DIR = os.environ.get('RESULTS_DIR', './cache/results')
+
+
+def _validate_csv_upload():
+    """Returns (file, None) for a valid CSV upload, or (None, error response)."""
     if 'file' not in request.files:
-        return jsonify({'error': 'No file provided'}), 400
+        return None, (jsonify({'error': 'No file provided'}), 400)
     file = request.files['file']
     if file.filename == '':
-        return jsonify({'error': 'No file selected'}), 400
+        return None, (jsonify({'error': 'No file selected'}), 400)
     if not file.filename.endswith('.csv'):
-        return jsonify({'error': 'File must be a CSV'}), 400
+        return None, (jsonify({'error': 'File must be a CSV'}), 400)
+    return file, None
+
+
+def _classify_rows(rows, include_review=True):
+    """Classifies a chunk of (row_number, review) pairs."""
+    reviews = [review for _, review in rows]
+    results = []
+    for (row, review), (prediction, confidence_score, cluster_id, cluster_size) in zip(
+        rows, predict_reviews_with_clusters(reviews, source='file')
+    ):
+        result = {
+            'row': row,
+            'prediction': prediction.upper(),
+            'confidence_score': f"{confidence_score:.2f}%",
+            'near_duplicate_cluster': cluster_id,
+            'cluster_size': cluster_size,
+        }
+        if include_review:
+            result['review'] = review
+        results.append(result)
+    return results
+
+
+@app.route('/analyze-file', methods=['POST'])
+@limit_concurrency
+def analyze_file():
+    file, error = _validate_csv_upload()
+    if error:
+        return error
     try:
-        df = pd.read_csv(file)
-        if 'review' not in df.columns:
+        if not has_review_column(file):
             return jsonify({'error': 'CSV must contain a "review" column'}), 400
+        # ?stream=1 streams results back as NDJSON, one line per review, chunk by chunk.
+        if request.args.get('stream', '0') not in ('0', 'false', ''):
+            include_review = request.args.get('include_review', '1') not in ('0', 'false')
+            return _stream_file_analysis(file, include_review)
+
         results = []
-        for review in df['review'].fillna(''):
-            if isinstance(review, str) and review.strip():
-                prediction, confidence_score = predict_review(review)
-                results.append({
-                    'review': review,
-                    'prediction': prediction.upper(),
-                    'confidence_score': f"{confidence_score:.2f}%"
-                })
+        for rows in iter_review_chunks(file, chunksize=ANALYZE_CHUNK_SIZE):
+            for result in _classify_rows(rows):
+                del result['row']
+                results.append(result)
         return jsonify(results)
+    except CSV_ERRORS as e:
+        return jsonify({'error': f'Could not read the CSV file: {e}'}), 400
+    except ModelUnavailable as e:
+        return _model_unavailable(e)
     except Exception as e:
         print(f"Error processing file: {e}")
         return jsonify({'error': str(e)}), 500
 
+
+def _save_upload(file):
+    """Spools an upload to a temporary file under RESULTS_DIR and returns its path."""
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    upload_fd, upload_path = tempfile.mkstemp(suffix='.csv', dir=RESULTS_DIR)
+    with os.fdopen(upload_fd, 'wb') as upload:
+        file.save(upload)
+    return upload_path
+
+
+def _stream_file_analysis(file, include_review):
+    # The upload is spooled to disk first so the stream does not depend on the request's file handle.
+    upload_path = _save_upload(file)
+
+    def generate():
+        processed = 0
+        try:
+            with open(upload_path, 'rb') as upload:
+                for rows in iter_review_chunks(upload, chunksize=ANALYZE_CHUNK_SIZE):
+                    for result in _classify_rows(rows, include_review=include_review):
+                        yield json.dumps(dict(result, type='result')) + "\n"
+                    processed += len(rows)
+            yield json.dumps({'type': 'status', 'status': 'done', 'classified': processed}) + "\n"
+        except Exception as e:
+            # Headers are already sent, so errors are reported in-band.
+            print(f"Error streaming file analysis: {e}")
+            yield json.dumps({'type': 'status', 'status': 'failed', 'classified': processed, 'error': str(e)}) + "\n"
+
+    try:
+        response = Response(generate(), mimetype='application/x-ndjson', headers={'X-Accel-Buffering': 'no'})
+    except BaseException:
+        remove_quietly(upload_path)
+        raise
+    # Removed when the response is closed, which also happens if the client leaves before the
+    # stream starts (a generator that never started would not run its own cleanup).
+    response.call_on_close(lambda: remove_quietly(upload_path))
+    return response
+
+
+# --- File analysis jobs: results are written incrementally to a downloadable file ---
+def _remove_job_files(job):
+    for key in ('upload_path', 'result_path'):
+        if job.params.get(key):
+            remove_quietly(job.params[key])
+
+
+file_jobs = JobStore(
+    max_jobs=int(os.environ.get('JOB_STORE_SIZE', 200)),
+    ttl_seconds=float(os.environ.get('JOB_TTL_SECONDS', 3600)),
+    on_evict=_remove_job_files,
+)
+# File jobs run inference outside the request limiter, so they get their own small bounded pool.
+file_job_executor = BoundedExecutor(
+    max_workers=int(os.environ.get('FILE_JOB_WORKERS', 1)),
+    max_queue=int(os.environ.get('FILE_JOB_QUEUE_SIZE', 4)),
+    name='file-job',
+)
+
+
+def _run_file_job(job):
+    job.start()
+    job.update_progress(chunks=0, classified=0)
+    writer = ResultWriter(job.params['result_path'], job.params['format'])
+    try:
+        with open(job.params['upload_path'], 'rb') as upload:
+            for chunk_number, rows in enumerate(iter_review_chunks(upload, chunksize=ANALYZE_CHUNK_SIZE), start=1):
+                writer.write(_classify_rows(rows))
+                job.update_progress(chunks=chunk_number, classified=writer.rows_written)
+        writer.close()
+        job.finish()
+        print(f"File job {job.id} complete: {writer.rows_written} reviews.")
+    except Exception as e:
+        print(f"An error occurred during file job {job.id}: {e}")
+        try:
+            writer.close()
+        except Exception:
+            pass
+        job.finish(error=str(e))
+    finally:
+        remove_quietly(job.params['upload_path'])
+
+
+@app.route('/analyze-file-jobs', methods=['POST'])
+def handle_create_file_job():
+    file, error = _validate_csv_upload()
+    if error:
+        return error
+    result_format = request.args.get('format', request.form.get('format', 'csv'))
+    if result_format not in RESULT_FORMATS:
+        return jsonify({'error': f'"format" must be one of: {", ".join(RESULT_FORMATS)}'}), 400
+    try:
+        if not has_review_column(file):
+            return jsonify({'error': 'CSV must contain a "review" column'}), 400
+    except CSV_ERRORS as e:
+        return jsonify({'error': f'Could not read the CSV file: {e}'}), 400
+
+    # The upload is spooled to disk, so it is never held in memory as a whole.
+    upload_path = _save_upload(file)
+
+    job = file_jobs.create('analyze-file', {'filename': secure_filename(file.filename), 'format': result_format})
+    job.params['upload_path'] = upload_path
+    job.params['result_path'] = os.path.join(RESULTS_DIR, job.id + RESULT_FORMATS[result_format])
+    try:
+        file_job_executor.submit(_run_file_job, job)
+    except Overloaded:
+        job.finish(error='Too many file jobs are running or queued.')
+        remove_quietly(upload_path)
+        return _too_busy('Too many file jobs are running or queued. Please try again shortly.', retry_after=30)
+    return jsonify({
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': f"/analyze-file-jobs/{job.id}",
+        'download_url': f"/analyze-file-jobs/{job.id}/download",
+    }), 202
+
+
+def _public_file_job(job):
+    snapshot = job.snapshot()
+    for key in ('results', 'offset', 'total_results'):
+        snapshot.pop(key)
+    snapshot['params'] = {'filename': job.params['filename'], 'format': job.params['format']}
+    return snapshot
+
+
+@app.route('/analyze-file-jobs/<job_id>', methods=['GET'])
+def handle_get_file_job(job_id):
+    job = file_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': f'No job with id "{job_id}".'}), 404
+    return jsonify(_public_file_job(job))
+
+
+@app.route('/analyze-file-jobs/<job_id>/download', methods=['GET'])
+def handle_download_file_job(job_id):
+    job = file_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': f'No job with id "{job_id}".'}), 404
+    if job.status != 'done':
+        return jsonify(_public_file_job(job)), 409
+    base_name = os.path.splitext(job.params['filename'])[0] or 'reviews'
+    return send_file(
+        os.path.abspath(job.params['result_path']),
+        as_attachment=True,
+        download_name=f"{base_name}_results{RESULT_FORMATS[job.params['format']]}",
+    )
+
+@app.route('/scraper-stats', methods=['GET'])
+def handle_scraper_stats():
+    return jsonify(dict(
+        driver_pool.stats(), executor=scrape_executor.stats(), ingest=ingest_executor.stats(),
+        rate_limiter=domain_rate_limiter.stats(),
+    ))
+
+@app.route('/server-stats', methods=['GET'])
+def handle_server_stats():
+    """This worker's process id, torch thread count and request/scrape backpressure counters."""
+    return jsonify({
+        'pid': os.getpid(),
+        'prefork': PREFORK_SERVER,
+        'torch_threads': torch.get_num_threads(),
+        'requests': request_limiter.stats(),
+        'predict': predict_limiter.stats(),
+        'scrapes': scrape_executor.stats(),
+        'file_jobs': file_job_executor.stats(),
+    })
+
+@app.route('/cache-stats', methods=['GET'])
+def handle_cache_stats():
+    return jsonify({
+        'predictions': dict(
+            prediction_cache.stats(),
+            model_fingerprint=classifier_slot.get(wait=False).fingerprint if classifier_slot.ready else None,
+        ),
+        'annotations': annotation_cache.stats(),
+        'reviews': review_store.stats(),
+        'near_duplicates': near_duplicate_index.stats(),
+        'scrapes': scrape_cache.stats(),
+    })
+
+@app.route('/cascade-stats', methods=['GET'])
+def handle_cascade_stats():
+    """How often the distilled aspect head answered, and how well it agrees with the zero-shot model."""
+    head = aspect_head_slot.get(wait=False) if aspect_head_slot.ready else None
+    return jsonify(dict(
+        cascade_stats.snapshot(),
+        enabled=ASPECT_CASCADE_ENABLED,
+        threshold=ASPECT_HEAD_THRESHOLD,
+        shadow_rate=ASPECT_HEAD_SHADOW_RATE,
+        head=head.head.metadata if head is not None else None,
+        head_state=aspect_head_slot.status(),
+    ))
+
+
+# --- Metrics, Server-Timing and sampling profiler ---
+SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING', '0') != '0'
+
+
+@app.before_request
+def _start_request_instrumentation():
+    metrics.begin_request()
+    if metrics.PROFILE_SAMPLE_RATE > 0 and random.random() < metrics.PROFILE_SAMPLE_RATE:
+        request.environ['verisure.profiler'] = profiler = cProfile.Profile()
+        profiler.enable()
+
+
+@app.after_request
+def _finish_request_instrumentation(response):
+    profiler = request.environ.pop('verisure.profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        os.makedirs(metrics.PROFILE_DIR, exist_ok=True)
+        profile_path = os.path.join(metrics.PROFILE_DIR, f"{request.endpoint or 'unknown'}-{int(time.time() * 1000)}-{os.getpid()}.prof")
+        profiler.dump_stats(profile_path)
+
+    total, timings = metrics.end_request()
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    if total is not None:
+        metrics.HTTP_REQUEST_SECONDS.observe(total, endpoint=endpoint, method=request.method)
+        if SERVER_TIMING_ENABLED:
+            response.headers['Server-Timing'] = metrics.server_timing_header(total, timings)
+    return response
+
+
+def _collect_component_metrics():
+    """Exports the existing stats() of the batcher, caches, driver pool and models as gauges."""
+    batch_stats = prediction_batcher.stats()
+    prediction_stats = prediction_cache.stats()
+    annotation_stats = annotation_cache.memory.stats()
+    pool_stats = driver_pool.stats()
+    limiter_stats = request_limiter.stats()
+    predict_limiter_stats = predict_limiter.stats()
+    executor_stats = scrape_executor.stats()
+    file_job_stats = file_job_executor.stats()
+    scrape_cache_stats = scrape_cache.stats()
+    rate_limiter_stats = domain_rate_limiter.stats()
+    cascade = cascade_stats.snapshot()
+    model_slots = (classifier_slot, zero_shot_slot, aspect_head_slot)
+    states = ('not_loaded', 'loading', 'ready', 'unloaded', 'failed')
+    return [
+        ('verisure_batcher_queue_depth', 'gauge', 'Items waiting in the /predict micro-batcher.',
+         [({}, batch_stats['queue_depth'])]),
+        ('verisure_batcher_batches_total', 'counter', 'Micro-batches run.', [({}, batch_stats['batches'])]),
+        ('verisure_batcher_items_total', 'counter', 'Items processed by the micro-batcher.', [({}, batch_stats['items'])]),
+        ('verisure_cache_hits_total', 'counter', 'Cache hits.',
+         [({'cache': 'predictions'}, prediction_stats['hits']), ({'cache': 'annotations'}, annotation_stats['hits'])]),
+        ('verisure_cache_misses_total', 'counter', 'Cache misses.',
+         [({'cache': 'predictions'}, prediction_stats['misses']), ({'cache': 'annotations'}, annotation_stats['misses'])]),
+        ('verisure_cache_evictions_total', 'counter', 'Cache evictions.',
+         [({'cache': 'predictions'}, prediction_stats['evictions']), ({'cache': 'annotations'}, annotation_stats['evictions'])]),
+        ('verisure_cache_size', 'gauge', 'Entries held in memory.',
+         [({'cache': 'predictions'}, prediction_stats['size']), ({'cache': 'annotations'}, annotation_stats['size'])]),
+        ('verisure_scraper_browsers', 'gauge', 'Scraper browsers by state.',
+         [({'state': 'idle'}, pool_stats['idle']), ({'state': 'in_use'}, pool_stats['in_use']), ({'state': 'waiting'}, pool_stats['waiting'])]),
+        ('verisure_scraper_launches_total', 'counter', 'Browsers launched by the driver pool.', [({}, pool_stats['launches'])]),
+        ('verisure_requests_in_flight', 'gauge', 'Inference requests running or queued in this worker.',
+         [({'queue': queue_name, 'state': state}, stats[state])
+          for queue_name, stats in (('requests', limiter_stats), ('predict', predict_limiter_stats)) for state in ('active', 'waiting')]),
+        ('verisure_requests_rejected_total', 'counter', 'Requests answered 429 because a queue was full.',
+         [({'queue': 'requests'}, limiter_stats['rejected'] + limiter_stats['timeouts']),
+          ({'queue': 'predict'}, predict_limiter_stats['rejected'] + predict_limiter_stats['timeouts']),
+          ({'queue': 'scrapes'}, executor_stats['rejected']), ({'queue': 'file_jobs'}, file_job_stats['rejected'])]),
+        ('verisure_scrapes_pending', 'gauge', 'Scrapes running or queued on the scrape executor.', [({}, executor_stats['pending'])]),
+        ('verisure_scrape_cache_total', 'counter', 'Scrapes served from the cache, refreshed incrementally or scraped from the start.',
+         [({'outcome': 'hit'}, scrape_cache_stats['hits']), ({'outcome': 'refresh'}, scrape_cache_stats['refreshes']),
+          ({'outcome': 'miss'}, scrape_cache_stats['misses'])]),
+        ('verisure_scrape_rate_limit_wait_seconds_total', 'counter', 'Time scrapes waited for the per-site rate limiter.',
+         [({}, rate_limiter_stats['wait_seconds'])]),
+        ('verisure_aspect_cascade_total', 'counter', 'Clauses annotated by the fast aspect head or its zero-shot fallback.',
+         [({'path': 'fast'}, cascade['fast']), ({'path': 'fallback'}, cascade['fallback'])]),
+        ('verisure_aspect_cascade_compared_total', 'counter', 'Clauses scored by both the aspect head and the zero-shot model.',
+         [({'kind': kind}, values['compared']) for kind, values in cascade['agreement'].items()]),
+        ('verisure_aspect_cascade_agreement', 'gauge', 'Share of compared clauses where the head and zero-shot model agree on aspect and sentiment.',
+         [({'kind': kind}, values['both_agreement']) for kind, values in cascade['agreement'].items() if values['compared']]),
+        ('verisure_model_state', 'gauge', 'Model load state (1 for the current state).',
+         [({'model': slot.name, 'state': state}, int(slot.state == state)) for slot in model_slots for state in states]),
+        ('verisure_model_load_seconds', 'gauge', 'Time it took to load each model.',
+         [({'model': slot.name}, slot.load_seconds) for slot in model_slots if slot.load_seconds is not None]),
+        ('verisure_model_parameter_bytes', 'gauge', 'Bytes held by each loaded model\'s weights (memory-mapped bytes included).',
+         [({'model': slot.name}, slot.memory['parameter_bytes']) for slot in model_slots if slot.ready and slot.memory]),
+        ('verisure_model_unloads_total', 'counter', 'Models unloaded because they were idle or over the memory budget.',
+         [({'model': slot.name}, slot.unloads) for slot in model_slots]),
+        ('verisure_process_resident_bytes', 'gauge', 'Resident set size of this process.',
+         [({}, process_memory()['rss_bytes'])]),
+    ]
+
+
+metrics.REGISTRY.register_collector(_collect_component_metrics)
+
+
+@app.route('/metrics', methods=['GET'])
+def handle_metrics():
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+
+# --- Pre-fork serving (see gunicorn.conf.py) ---
+def preload_models():
+    """
+    Loads the models synchronously in the gunicorn master, before any worker is forked, so all
+    workers share the weight pages copy-on-write. Nothing runs a forward pass here, and torch
+    stays single-threaded: thread pools started before a fork are not usable in the children.
+    """
+    torch.set_num_threads(1)
+    slots = [zero_shot_slot]
+    if INFERENCE_BACKEND == 'torch':
+        # ONNX Runtime starts its thread pool when the session is created, so ONNX engines are
+        # loaded in each worker instead.
+        slots[:0] = [classifier_slot, aspect_head_slot]
+    for slot in slots:
+        try:
+            slot.load()
+        except ModelUnavailable:
+            pass  # Workers retry on first use.
+    release_memory()
+    # Keep the garbage collector from writing to (and so copying) every preloaded object in each worker.
+    gc.freeze()
+
+
+def after_fork(workers):
+    """
+    Per-worker setup: splits the CPU cores between the workers' torch thread pools, reopens the
+    SQLite connections (a connection must not be used across a fork) and starts the worker's
+    background threads.
+    """
+    threads = int(os.environ.get('TORCH_THREADS_PER_WORKER', 0)) or max(1, (os.cpu_count() or 1) // max(1, workers))
+    torch.set_num_threads(threads)
+    annotation_cache.reopen()
+    review_store.reopen()
+    near_duplicate_index.reopen()
+    scrape_cache.reopen()
+    domain_rate_limiter.reopen()
+    start_background_threads()
+    print(f"Worker {os.getpid()} ready with {threads} torch thread(s).")
+
+
+@app.cli.command('precompute-annotations')
+def precompute_annotations():
+    """Annotates every stored review so new containers start with warm annotations and consensus counters."""
+    zero_shot_slot.load()
+    print(f"Precomputing zero-shot annotations for {len(review_store.pending_reviews())} reviews...")
+    annotate_pending_reviews()
+    print(f"Done. Annotation cache now holds {annotation_cache.disk_size()} entries at {ANNOTATION_CACHE_PATH}.")
+    print(f"Review store: {review_store.stats()}")
+
+
+@app.cli.command('distill-aspect-head')
+@click.option('--from-csv', type=click.Path(exists=True, dir_okay=False), default=None,
+              help="Also label the clauses of a CSV's 'review' column with the zero-shot model first.")
+@click.option('--holdout', type=float, default=0.1, show_default=True, help="Fraction kept aside to measure agreement.")
+@click.option('--min-samples', type=int, default=200, show_default=True)
+def distill_aspect_head(from_csv, holdout, min_samples):
+    """Trains the fast aspect/sentiment head from cached zero-shot annotations."""
+    if from_csv:
+        zero_shot_slot.load()
+        with open(from_csv, 'rb') as f:
+            for rows in iter_review_chunks(f, chunksize=ANALYZE_CHUNK_SIZE):
+                clauses = [clause for _, review in rows for clause in split_review_into_clauses(review)]
+                get_annotations(clauses, allow_fast=False)
+                print(f"Labelled {len(clauses)} clauses with the zero-shot model.")
+
+    rows = list(annotation_cache.iter_disk())
+    if len(rows) < min_samples:
+        raise click.ClickException(
+            f"Only {len(rows)} cached zero-shot annotations; need {min_samples}. Use --from-csv or serve more cross-checks first."
+        )
+    texts, aspects, sentiments = zip(*rows)
+    classifier = classifier_slot.load()
+    encoder = load_encoder(classifier.engine, MODEL_PATH)
+    print(f"Embedding {len(texts)} annotated texts...")
+    embeddings = embed_texts(encoder, classifier.tokenizer, list(texts), batch_size=PREDICT_BATCH_SIZE)
+    try:
+        head, report = train_head(embeddings, list(aspects), list(sentiments), holdout=holdout, metadata={
+            'label_set_version': LABEL_SET_VERSION,
+            'zero_shot_model': ZERO_SHOT_MODEL,
+            'encoder_fingerprint': file_fingerprint(MODEL_PATH),
+        })
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    os.makedirs(os.path.dirname(ASPECT_HEAD_PATH) or '.', exist_ok=True)
+    head.save(ASPECT_HEAD_PATH)
+    print(json.dumps(report, indent=2))
+    print(f"Aspect head saved to {ASPECT_HEAD_PATH}. Choose ASPECT_HEAD_THRESHOLD from the holdout report above.")
+
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=7860)
 
@@ -0,0 +1,183 @@
+import random
+import threading
+import time
+
+import numpy as np
+import torch
+
+from batcher import length_buckets
+from metrics import stage
+
+# --- Fast aspect/sentiment head: the first stage of the cross-check cascade ---
+# Two logistic-regression heads over mean-pooled embeddings from the fake/real classifier's
+# DistilRoBERTa encoder, distilled from cached zero-shot annotations. A clause is scored by one
+# encoder forward pass instead of one NLI forward pass per label; when the head is not confident
+# enough the clause falls back to the zero-shot model.
+
+
+def load_encoder(engine, model_path):
+    """Reuses the PyTorch classifier's encoder, or loads the bare encoder for other backends."""
+    model = getattr(engine, 'model', None)
+    if model is not None and getattr(model, 'base_model', None) is not None:
+        return model.base_model
+    from transformers import AutoModel
+    return AutoModel.from_pretrained(model_path).eval()
+
+
+def embed_texts(encoder, tokenizer, texts, batch_size=32):
+    """Mean-pooled last hidden states, one row per text. Texts are bucketed by length before padding."""
+    if not texts:
+        return np.zeros((0, encoder.config.hidden_size), dtype=np.float32)
+    encodings = tokenizer(list(texts), truncation=True, max_length=128)
+    embeddings = np.empty((len(texts), encoder.config.hidden_size), dtype=np.float32)
+    for bucket, inputs in length_buckets(tokenizer, encodings, batch_size):
+        with stage('aspect_head_embed'), torch.no_grad():
+            hidden = encoder(input_ids=inputs['input_ids'], attention_mask=inputs['attention_mask']).last_hidden_state
+            mask = inputs['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+        embeddings[bucket] = pooled.float().numpy()
+    return embeddings
+
+
+class AspectHead:
+    """
+    Aspect and sentiment classifiers over sentence embeddings, plus the metadata needed to decide
+    whether a saved head still matches the current label set and encoder.
+    """
+
+    def __init__(self, aspect_model, sentiment_model, metadata):
+        self.aspect_model = aspect_model
+        self.sentiment_model = sentiment_model
+        self.metadata = metadata
+
+    def predict(self, embeddings):
+        """
+        Returns one annotation per row, in the zero-shot annotation format, plus its confidence:
+        the lower of the top aspect and top sentiment probabilities.
+        """
+        if not len(embeddings):
+            return []
+        aspect_probs = self.aspect_model.predict_proba(embeddings)
+        sentiment_probs = self.sentiment_model.predict_proba(embeddings)
+        aspect_labels = list(self.aspect_model.classes_)
+        sentiment_labels = list(self.sentiment_model.classes_)
+        results = []
+        for aspect_row, sentiment_row in zip(aspect_probs.tolist(), sentiment_probs.tolist()):
+            aspect_index = aspect_row.index(max(aspect_row))
+            sentiment_index = sentiment_row.index(max(sentiment_row))
+            results.append(({
+                'aspect': aspect_labels[aspect_index],
+                'sentiment': sentiment_labels[sentiment_index],
+                'scores': {
+                    'aspect': dict(zip(aspect_labels, aspect_row)),
+                    'sentiment': dict(zip(sentiment_labels, sentiment_row)),
+                },
+            }, min(aspect_row[aspect_index], sentiment_row[sentiment_index])))
+        return results
+
+    def save(self, path):
+        import joblib
+        joblib.dump({'aspect': self.aspect_model, 'sentiment': self.sentiment_model, 'metadata': self.metadata}, path)
+
+    @classmethod
+    def load(cls, path):
+        import joblib
+        data = joblib.load(path)
+        return cls(data['aspect'], data['sentiment'], data['metadata'])
+
+
+def _agreement(head, embeddings, aspects, sentiments, thresholds):
+    """Agreement with the zero-shot labels overall and among the rows accepted at each threshold."""
+    predictions = head.predict(embeddings)
+    aspect_ok = np.array([p['aspect'] == a for (p, _), a in zip(predictions, aspects)])
+    sentiment_ok = np.array([p['sentiment'] == s for (p, _), s in zip(predictions, sentiments)])
+    both_ok = aspect_ok & sentiment_ok
+    confidence = np.array([c for _, c in predictions])
+    report = {
+        'samples': len(predictions),
+        'aspect_agreement': float(aspect_ok.mean()),
+        'sentiment_agreement': float(sentiment_ok.mean()),
+        'both_agreement': float(both_ok.mean()),
+        'thresholds': {},
+    }
+    for threshold in thresholds:
+        accepted = confidence >= threshold
+        report['thresholds'][str(threshold)] = {
+            'fast_path_rate': float(accepted.mean()),
+            'agreement_when_fast': float(both_ok[accepted].mean()) if accepted.any() else None,
+        }
+    return report
+
+
+def train_head(embeddings, aspects, sentiments, metadata, holdout=0.1, thresholds=(0.5, 0.6, 0.7, 0.8, 0.9, 0.95), seed=0):
+    """
+    Fits the aspect and sentiment heads on zero-shot labels. A random `holdout` fraction is kept
+    aside to report agreement with the zero-shot model, which is what the threshold trades off.
+    Returns (head, report).
+    """
+    from sklearn.linear_model import LogisticRegression
+
+    if len(set(aspects)) < 2 or len(set(sentiments)) < 2:
+        raise ValueError("Need annotations covering at least two aspects and both sentiments to train the head.")
+    indices = list(range(len(embeddings)))
+    random.Random(seed).shuffle(indices)
+    split = int(len(indices) * holdout)
+    test, train = indices[:split], indices[split:]
+
+    def fit(labels):
+        model = LogisticRegression(max_iter=2000, class_weight='balanced', C=1.0)
+        model.fit(embeddings[train], [labels[i] for i in train])
+        return model
+
+    head = AspectHead(fit(aspects), fit(sentiments), dict(metadata, trained_at=time.time(), samples=len(train)))
+    report = {'train_samples': len(train)}
+    if test:
+        report['holdout'] = _agreement(
+            head, embeddings[test], [aspects[i] for i in test], [sentiments[i] for i in test], thresholds,
+        )
+    head.metadata['report'] = report
+    return head, report
+
+
+class CascadeStats:
+    """
+    Counts how often the fast head answered and how often it fell back to the zero-shot model,
+    and how often the two agreed whenever both were run (fallbacks and shadow samples).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.fast = 0
+        self.fallback = 0
+        self.comparisons = {'fallback': [0, 0, 0], 'shadow': [0, 0, 0]}  # compared, aspect agrees, both agree
+
+    def record_paths(self, fast, fallback):
+        with self._lock:
+            self.fast += fast
+            self.fallback += fallback
+
+    def record_comparison(self, kind, fast_annotation, full_annotation):
+        aspect_agrees = fast_annotation['aspect'] == full_annotation['aspect']
+        both_agree = aspect_agrees and fast_annotation['sentiment'] == full_annotation['sentiment']
+        with self._lock:
+            counts = self.comparisons[kind]
+            counts[0] += 1
+            counts[1] += int(aspect_agrees)
+            counts[2] += int(both_agree)
+
+    def snapshot(self):
+        with self._lock:
+            total = self.fast + self.fallback
+            result = {
+                'fast': self.fast,
+                'fallback': self.fallback,
+                'fallback_rate': self.fallback / total if total else None,
+                'agreement': {},
+            }
+            for kind, (compared, aspect_agrees, both_agree) in self.comparisons.items():
+                result['agreement'][kind] = {
+                    'compared': compared,
+                    'aspect_agreement': aspect_agrees / compared if compared else None,
+                    'both_agreement': both_agree / compared if compared else None,
+                }
+        return result
@@ -0,0 +1,170 @@
+import contextlib
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import metrics
+
+
+class MicroBatcher:
+    """
+    Coalesces single-item inference calls coming from concurrent requests.
+
+    A background worker waits for the first queued item, keeps collecting items
+    until either `max_batch_size` is reached or `max_wait_ms` has passed, then runs
+    `batch_fn` once over the whole batch and hands every caller its own result.
+    `batch_fn` must take a list of items and return a list of results in the same order.
+    If a batch fails, its items are scored one by one, so a bad item only fails its own caller.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=32, max_wait_ms=5, name="micro-batcher"):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+        # --- Stats ---
+        self._batches = 0
+        self._items = 0
+        self._errors = 0
+        self._fallbacks = 0
+        self._max_batch_seen = 0
+        self._max_queue_depth = 0
+        self._total_wait = 0.0
+        self._batch_size_counts = {}
+
+    def _ensure_started(self):
+        # The worker is started lazily and restarted after a fork, because threads
+        # do not survive into child processes.
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def submit(self, item):
+        """Queues one item and returns a Future that resolves to its result."""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((item, future, time.monotonic()))
+        depth = self._queue.qsize()
+        with self._stats_lock:
+            if depth > self._max_queue_depth:
+                self._max_queue_depth = depth
+        return future
+
+    def __call__(self, item, timeout=None):
+        future = self.submit(item)
+        try:
+            return future.result(timeout=timeout)
+        finally:
+            # The batch ran on the worker thread; hand its stage timings to the caller's request.
+            metrics.record_timings(getattr(future, 'stage_timings', ()))
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    # Window is over, but still take anything that is already waiting.
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _call(self, items):
+        results = self.batch_fn(items)
+        if len(results) != len(items):
+            raise RuntimeError(f"{self.name}: batch_fn returned {len(results)} results for {len(items)} items")
+        return results
+
+    def _score(self, items):
+        """Returns (result, error) per item and whether the batch had to be retried item by item."""
+        try:
+            return [(result, None) for result in self._call(items)], False
+        except Exception as e:
+            if len(items) == 1:
+                return [(None, e)], False
+        outcomes = []
+        for item in items:
+            try:
+                outcomes.append((self._call([item])[0], None))
+            except Exception as e:
+                outcomes.append((None, e))
+        return outcomes, True
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            items = [item for item, _, _ in batch]
+            started = time.monotonic()
+            with metrics.collect_stages() as stage_timings:
+                outcomes, fell_back = self._score(items)
+            for (_, future, enqueued), (result, error) in zip(batch, outcomes):
+                future.stage_timings = [('batch_queue_wait', started - enqueued)] + stage_timings
+                if error is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(error)
+
+            with self._stats_lock:
+                size = len(batch)
+                self._batches += 1
+                self._items += size
+                self._errors += sum(error is not None for _, error in outcomes)
+                self._fallbacks += int(fell_back)
+                self._max_batch_seen = max(self._max_batch_seen, size)
+                self._batch_size_counts[size] = self._batch_size_counts.get(size, 0) + 1
+                self._total_wait += sum(started - enqueued for _, _, enqueued in batch)
+
+    def stats(self):
+        """Returns queue-depth and batch-size statistics."""
+        with self._stats_lock:
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0,
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self._max_queue_depth,
+                'batches': self._batches,
+                'items': self._items,
+                'errors': self._errors,
+                'fallbacks': self._fallbacks,
+                'avg_batch_size': (self._items / self._batches) if self._batches else 0.0,
+                'max_batch_size_seen': self._max_batch_seen,
+                'avg_queue_wait_ms': (self._total_wait / self._items * 1000.0) if self._items else 0.0,
+                'batch_size_histogram': {str(k): v for k, v in sorted(self._batch_size_counts.items())},
+            }
+
+
+def length_buckets(tokenizer, encodings, batch_size, pad_stage=None):
+    """
+    Yields (indices, inputs) over already tokenized `encodings`. Rows are sorted by token length
+    and cut into batches of `batch_size`, each padded ("pt" tensors) only to its own longest row;
+    `indices` are the rows' positions in `encodings`. `pad_stage` times the padding as a stage.
+    """
+    batch_size = max(1, int(batch_size))
+    lengths = [len(ids) for ids in encodings['input_ids']]
+    order = sorted(range(len(lengths)), key=lengths.__getitem__)
+    for start in range(0, len(order), batch_size):
+        bucket = order[start:start + batch_size]
+        with metrics.stage(pad_stage) if pad_stage else contextlib.nullcontext():
+            features = [{key: encodings[key][i] for key in encodings.keys()} for i in bucket]
+            inputs = tokenizer.pad(features, padding=True, return_tensors="pt")
+        yield bucket, inputs
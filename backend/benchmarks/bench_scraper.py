@@ -0,0 +1,127 @@
+import argparse
+import glob
+import os
+import statistics
+import time
+
+from bs4 import BeautifulSoup
+
+from scraper import REVIEW_CARD_SELECTOR, REVIEW_TITLE_SELECTOR, extract_review_titles, parse_review_titles
+
+# --- Scraper extraction benchmark against saved Booking.com-style pages ---
+# Compares the old per-page extraction (fixed 2s sleep + full-page html.parser soup) with
+# fragment-only lxml parsing and, optionally, in-browser extraction in headless Chromium.
+# Run from the backend directory:  python -m benchmarks.bench_scraper [--browser]
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+LEGACY_SLEEP_PER_PAGE = 2.0
+
+
+def load_fixtures(pattern='booking_reviews_page*.html'):
+    paths = sorted(glob.glob(os.path.join(FIXTURES_DIR, pattern)))
+    if not paths:
+        raise SystemExit(f"No fixtures found in {FIXTURES_DIR}. Run: python -m benchmarks.make_fixtures")
+    pages = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            pages.append((path, f.read()))
+    return pages
+
+
+def legacy_parse_review_titles(html):
+    """The original extraction: the whole page goes through BeautifulSoup's pure-Python parser."""
+    soup = BeautifulSoup(html, 'html.parser')
+    titles = []
+    for card in soup.select(REVIEW_CARD_SELECTOR):
+        title_element = card.select_one(REVIEW_TITLE_SELECTOR)
+        titles.append(title_element.get_text(strip=True) if title_element else None)
+    return titles
+
+
+def _time_calls(fn, args, repeats):
+    timings = []
+    result = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn(*args)
+        timings.append(time.perf_counter() - started)
+    return result, timings
+
+
+def _summary(timings):
+    timings = sorted(timings)
+    return {
+        'mean_ms': statistics.mean(timings) * 1000,
+        'p50_ms': timings[len(timings) // 2] * 1000,
+        'max_ms': timings[-1] * 1000,
+    }
+
+
+def bench_parsers(pages, repeats=5):
+    """Per-page parse latency of the legacy and the fragment-only lxml extraction."""
+    results = {'legacy_html_parser': [], 'lxml_fragments': []}
+    for path, html in pages:
+        legacy_titles, legacy_timings = _time_calls(legacy_parse_review_titles, (html,), repeats)
+        new_titles, new_timings = _time_calls(parse_review_titles, (html,), repeats)
+        if legacy_titles != new_titles:
+            raise AssertionError(f"Extraction mismatch on {os.path.basename(path)}")
+        results['legacy_html_parser'].extend(legacy_timings)
+        results['lxml_fragments'].extend(new_timings)
+
+    report = {name: _summary(timings) for name, timings in results.items()}
+    pages_count = len(pages)
+    legacy_per_page = report['legacy_html_parser']['mean_ms'] / 1000
+    new_per_page = report['lxml_fragments']['mean_ms'] / 1000
+    report['per_scrape_estimate_s'] = {
+        'pages': pages_count,
+        'legacy': pages_count * (legacy_per_page + LEGACY_SLEEP_PER_PAGE),
+        'lxml_fragments': pages_count * new_per_page,
+    }
+    return report
+
+
+def bench_browser(pages, repeats=3):
+    """Opt-in: in-browser extraction vs page_source + legacy parsing in a real headless Chromium."""
+    from scraper import create_driver
+
+    driver = create_driver()
+    try:
+        legacy, in_browser = [], []
+        for path, _ in pages:
+            driver.get('file://' + path)
+            for _ in range(repeats):
+                started = time.perf_counter()
+                legacy_titles = legacy_parse_review_titles(driver.page_source)
+                legacy.append(time.perf_counter() - started)
+                started = time.perf_counter()
+                js_titles = extract_review_titles(driver)
+                in_browser.append(time.perf_counter() - started)
+            if len(legacy_titles) != len(js_titles):
+                raise AssertionError(f"Card count mismatch on {os.path.basename(path)}")
+        return {'page_source_html_parser': _summary(legacy), 'in_browser_js': _summary(in_browser)}
+    finally:
+        driver.quit()
+
+
+def run(repeats=5, browser=False):
+    pages = load_fixtures()
+    report = {'parsers': bench_parsers(pages, repeats=repeats)}
+    if browser:
+        report['browser'] = bench_browser(pages, repeats=max(1, repeats // 2))
+    return report
+
+
+def _print_report(report):
+    for section, results in report.items():
+        print(f"--- {section} ---")
+        for name, values in results.items():
+            formatted = ", ".join(f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}" for key, value in values.items())
+            print(f"{name}: {formatted}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark review extraction on saved Booking.com-style pages.")
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--browser', action='store_true', help="Also benchmark in-browser extraction (needs Chromium).")
+    args = parser.parse_args()
+    _print_report(run(repeats=args.repeats, browser=args.browser))
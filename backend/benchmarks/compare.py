@@ -0,0 +1,71 @@
+import argparse
+import json
+import sys
+
+# --- Compares two benchmark result files written by benchmarks.run ---
+# A case regresses when its throughput drops, or its p95 latency or peak RSS grows, by more
+# than the threshold. Exits with status 1 if any case regressed, so it can gate a deploy.
+#   python -m benchmarks.compare baseline.json candidate.json --threshold 0.10
+
+
+def _change(old, new):
+    if not old or new is None:
+        return None
+    return (new - old) / old
+
+
+def compare(baseline, candidate, threshold=0.10, rss_threshold=0.20):
+    """Returns (rows, regressions); each row is (case, metric, old, new, relative_change, regressed)."""
+    rows = []
+    regressions = []
+    for name, old in baseline['cases'].items():
+        new = candidate['cases'].get(name)
+        if new is None:
+            continue
+        checks = (
+            ('throughput_per_s', -1, threshold),
+            ('p95_ms', 1, threshold),
+            ('peak_rss_mb', 1, rss_threshold),
+        )
+        for metric, direction, limit in checks:
+            change = _change(old.get(metric), new.get(metric))
+            regressed = change is not None and change * direction > limit
+            rows.append((name, metric, old.get(metric), new.get(metric), change, regressed))
+            if regressed:
+                regressions.append((name, metric, change))
+    return rows, regressions
+
+
+def print_comparison(rows, baseline, candidate):
+    print(f"baseline:  {baseline['meta'].get('commit')} ({baseline['meta'].get('models')} models)")
+    print(f"candidate: {candidate['meta'].get('commit')} ({candidate['meta'].get('models')} models)")
+    print(f"{'case':<36} {'metric':<18} {'baseline':>12} {'candidate':>12} {'change':>9}")
+    for name, metric, old, new, change, regressed in rows:
+        change_text = f"{change * 100:+.1f}%" if change is not None else 'n/a'
+        marker = '  REGRESSION' if regressed else ''
+        print(f"{name:<36} {metric:<18} {old or 0:>12.2f} {new or 0:>12.2f} {change_text:>9}{marker}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Diff two benchmark result files and flag regressions.")
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="Allowed relative throughput drop or p95 increase (default 0.10).")
+    parser.add_argument('--rss-threshold', type=float, default=0.20,
+                        help="Allowed relative peak RSS increase (default 0.20).")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    if baseline['meta'].get('models') != candidate['meta'].get('models'):
+        print("Warning: the two runs used different models; latencies are not comparable.", file=sys.stderr)
+
+    rows, regressions = compare(baseline, candidate, args.threshold, args.rss_threshold)
+    print_comparison(rows, baseline, candidate)
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond the threshold.")
+        sys.exit(1)
+    print("No regressions beyond the threshold.")
@@ -0,0 +1,107 @@
+import os
+import random
+
+# --- Generates Booking.com-style hotel pages with a rendered reviews panel ---
+# The markup mirrors the parts of the live page the scraper relies on (review cards, titles,
+# pagination and cookie banner) and pads them with the kind of surrounding markup, inline
+# scripts and styles that make real pages large. Output is deterministic.
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+TITLES = [
+    "Great stay", "Excellent", "Exceptional", "Wonderful location", "Very good value for money",
+    "Not as advertised", "Noisy rooms but friendly staff", "Would definitely come back",
+    "Disappointing breakfast", "Perfect for a business trip", "Clean and comfortable",
+    "Staff went above and beyond", "Overpriced for what you get", "Lovely pool and spa",
+    "WiFi was terrible", "Amazing views from the room", "Average", "Good", "Superb",
+    "Room service was slow", "Best hotel in the city", "Would not recommend",
+]
+POSITIVES = [
+    "The staff were incredibly welcoming and helpful throughout our stay.",
+    "Breakfast had a huge variety and everything was fresh.",
+    "The room was spacious, quiet and spotlessly clean.",
+    "Location is perfect, walking distance to everything we wanted to see.",
+    "The bed was very comfortable and the shower pressure was great.",
+]
+NEGATIVES = [
+    "The WiFi kept dropping in the evenings.",
+    "Check-in took far too long and nobody apologised.",
+    "Street noise was noticeable even with the windows closed.",
+    "Parking was expensive and hard to find.",
+    "Room service forgot part of our order.",
+]
+COUNTRIES = ["India", "United Kingdom", "Germany", "United States", "France", "Japan", "Australia"]
+NAMES = ["Rohan", "Priya", "Anjali", "David", "Sophie", "Michael", "Aarav", "Emma", "Lucas", "Mei"]
+
+
+def _filler_script(rng, size):
+    chunks = []
+    while sum(len(c) for c in chunks) < size:
+        chunks.append(f"window.__b_{rng.randrange(10**9)}={{\"k\":\"{rng.randrange(10**12):x}\",\"v\":[{','.join(str(rng.randrange(1000)) for _ in range(20))}]}};")
+    return "".join(chunks)
+
+
+def _filler_sections(rng, count):
+    sections = []
+    for i in range(count):
+        items = "".join(f'<li class="bui-list__item"><span class="facility-{rng.randrange(999)}">Facility {rng.randrange(999)}</span></li>' for _ in range(15))
+        sections.append(
+            f'<section class="hp-section-{i}" data-component="hotel/new-rooms-table/{i}">'
+            f'<div class="hp_desc_main_content"><p>{" ".join(rng.choice(POSITIVES) for _ in range(6))}</p></div>'
+            f'<ul class="bui-list">{items}</ul></section>'
+        )
+    return "".join(sections)
+
+
+def _review_card(rng, with_title=True):
+    title = f'<h4 data-testid="review-title" class="b-review__title">\n  {rng.choice(TITLES)}\n</h4>' if with_title else ''
+    return (
+        '<div data-testid="review-card" class="c-review-block">'
+        '<div class="c-review-block__row">'
+        f'<div class="bui-avatar-block"><img class="bui-avatar__image" src="/avatar/{rng.randrange(10**6)}.jpg" alt="">'
+        f'<span class="bui-avatar-block__title">{rng.choice(NAMES)}</span>'
+        f'<span class="bui-avatar-block__subtitle">{rng.choice(COUNTRIES)}</span></div>'
+        f'<div class="c-review-block__room-info"><span>Deluxe Double Room</span><span>{rng.randrange(1, 9)} nights</span>'
+        f'<span>{rng.choice(["Solo traveller", "Couple", "Family", "Group"])}</span></div></div>'
+        f'<div class="c-review-block__right"><div class="bui-review-score__badge">{rng.randrange(10, 101) / 10:.1f}</div>'
+        f'{title}'
+        f'<div class="c-review__row"><p class="c-review__inner"><span class="c-review__prefix">Liked</span>'
+        f'<span class="c-review__body">{rng.choice(POSITIVES)}</span></p></div>'
+        f'<div class="c-review__row lalala"><p class="c-review__inner"><span class="c-review__prefix">Disliked</span>'
+        f'<span class="c-review__body">{rng.choice(NEGATIVES)}</span></p></div>'
+        '<div class="review-helpful__vote-others-helpful"><button type="button">Helpful</button><button type="button">Not helpful</button></div>'
+        '</div></div>'
+    )
+
+
+def make_page(page, total_pages, cards_per_page=10, seed=0):
+    rng = random.Random(seed * 1000 + page)
+    cards = "".join(_review_card(rng, with_title=(i % 7 != 6)) for i in range(cards_per_page))
+    next_button = (
+        '<button aria-label="Next page" type="button" class="bui-pagination__link">Next</button>'
+        if page < total_pages else ''
+    )
+    return (
+        '<!DOCTYPE html><html lang="en-gb"><head><meta charset="utf-8"><title>Hotel fixture - Booking.com</title>'
+        f'<style>{"".join(f".c{rng.randrange(10**6)}{{margin:{rng.randrange(20)}px;color:#{rng.randrange(16**6):06x}}}" for _ in range(1500))}</style>'
+        f'<script>{_filler_script(rng, 60000)}</script></head><body>'
+        '<div id="onetrust-banner-sdk"><button id="onetrust-accept-btn-handler">Accept</button></div>'
+        '<header class="bui-header"><nav>' + "".join(f'<a href="/nav/{i}">Link {i}</a>' for i in range(60)) + '</nav></header>'
+        '<main><h2 class="pp-header__title">Fixture Grand Hotel</h2>'
+        '<button id="reviews-tab-trigger" type="button">Guest reviews</button>'
+        f'{_filler_sections(rng, 25)}'
+        f'<div class="reviews-panel"><div data-testid="review-list">{cards}</div>'
+        f'<div class="bui-pagination">{next_button}</div></div>'
+        f'{_filler_sections(rng, 15)}</main>'
+        f'<script>{_filler_script(rng, 40000)}</script></body></html>'
+    )
+
+
+if __name__ == '__main__':
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    total_pages = 5
+    for page in range(1, total_pages + 1):
+        path = os.path.join(FIXTURES_DIR, f'booking_reviews_page{page}.html')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(make_page(page, total_pages))
+        print(f"Wrote {path}")
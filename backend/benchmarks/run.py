@@ -0,0 +1,370 @@
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# --- Offline benchmark and load-test suite ---
+# Runs the hot paths end to end with no network: single and batched prediction, clause
+# splitting and the full cross-check, /analyze-file on synthetic CSVs and, opt-in, the
+# scraper's in-browser review extraction on the saved Booking.com-style pages. By default the
+# models are tiny randomly initialized stand-ins (see stub_models.py); pass --models real to use
+# the real weights.
+# Run from the backend directory:
+#   python -m benchmarks.run --out results.json
+#   python -m benchmarks.compare baseline.json results.json
+
+SUITES = ('predict', 'cross_check', 'analyze_file', 'scraper', 'load')
+# The scraper suite needs headless Chromium, so it only runs when asked for with --suite scraper.
+DEFAULT_SUITES = tuple(suite for suite in SUITES if suite != 'scraper')
+LENGTHS = {'short': 8, 'medium': 40, 'long': 160}
+BATCH_SIZES = (1, 8, 32, 64)
+
+
+def _import_app(models, workdir):
+    """Imports the Flask app with caches and result files kept in a throwaway directory."""
+    os.environ.setdefault('WARMUP_ON_IMPORT', '0')
+    os.environ['ANNOTATION_CACHE_PATH'] = os.path.join(workdir, 'annotations.sqlite3')
+    os.environ['REVIEW_DB_PATH'] = os.path.join(workdir, 'reviews.sqlite3')
+    os.environ['NEAR_DUPLICATE_DB_PATH'] = os.path.join(workdir, 'near_duplicates.sqlite3')
+    os.environ['SCRAPE_CACHE_PATH'] = os.path.join(workdir, 'scrapes.sqlite3')
+    # Reusing a near-duplicate cluster's stored prediction would skip inference on every repeat.
+    os.environ['NEAR_DUPLICATE_REUSE'] = '0'
+    os.environ['RESULTS_DIR'] = os.path.join(workdir, 'results')
+    if models == 'stub':
+        # A distilled head belongs to the real encoder; the stubs run without one.
+        os.environ['ASPECT_HEAD_PATH'] = os.path.join(workdir, 'aspect_head.joblib')
+    import app as app_module
+    if models == 'stub':
+        from benchmarks.stub_models import install_stub_models
+        install_stub_models(app_module)
+    app_module.classifier_slot.load()
+    app_module.zero_shot_slot.load()
+    return app_module
+
+
+# --- Measurement helpers ---
+class PeakRss:
+    """
+    Samples the resident set size in a background thread while a case runs.
+    Without psutil it falls back to the process-wide high-water mark.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+        try:
+            import psutil
+            self._process = psutil.Process()
+        except ImportError:
+            self._process = None
+
+    def _rss(self):
+        if self._process is not None:
+            return self._process.memory_info().rss
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self._rss())
+
+    def __enter__(self):
+        self.peak = self._rss()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._rss())
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, items, elapsed, peak_rss, unit='item'):
+    latencies = sorted(latencies)
+    return {
+        'unit': unit,
+        'items': items,
+        'calls': len(latencies),
+        'seconds': elapsed,
+        'throughput_per_s': items / elapsed if elapsed else None,
+        'mean_ms': statistics.mean(latencies) * 1000 if latencies else None,
+        'p50_ms': _percentile(latencies, 50) * 1000 if latencies else None,
+        'p95_ms': _percentile(latencies, 95) * 1000 if latencies else None,
+        'p99_ms': _percentile(latencies, 99) * 1000 if latencies else None,
+        'peak_rss_mb': peak_rss / (1024 * 1024),
+    }
+
+
+def measure(calls, unit='item', warmup=1, setup=None):
+    """
+    Runs `calls`, a list of (fn, items) pairs, after `warmup` untimed calls of the first one.
+    Latency is per call; throughput counts `items` per second across all calls, and `setup()`,
+    if given, runs untimed before every call.
+    """
+    for fn, _ in calls[:warmup]:
+        if setup is not None:
+            setup()
+        fn()
+    latencies = []
+    items = 0
+    elapsed = 0.0
+    with PeakRss() as rss:
+        for fn, count in calls:
+            if setup is not None:
+                setup()
+            call_started = time.perf_counter()
+            fn()
+            latencies.append(time.perf_counter() - call_started)
+            elapsed += latencies[-1]
+            items += count
+    return summarize(latencies, items, elapsed, rss.peak, unit)
+
+
+# --- Synthetic inputs ---
+def make_reviews(rng, count, words):
+    from benchmarks.stub_models import synthetic_review
+    # A serial number keeps every text unique so the prediction cache cannot short-circuit a run.
+    return [f"{synthetic_review(rng, words)} Stay {i}." for i in range(count)]
+
+
+def make_cross_check_review(rng):
+    from benchmarks.stub_models import synthetic_review
+    parts = [synthetic_review(rng, rng.randint(4, 10)).rstrip('.') for _ in range(rng.randint(2, 5))]
+    return ', but '.join(parts) + '.'
+
+
+def make_csv(rng, rows, words=30):
+    buffer = io.StringIO()
+    buffer.write('review,rating\n')
+    for review in make_reviews(rng, rows, words):
+        buffer.write(f'"{review}",{rng.randint(1, 10)}\n')
+    return buffer.getvalue().encode('utf-8')
+
+
+# --- Suites ---
+def bench_predict(app_module, rng, calls):
+    results = {}
+    for length, words in LENGTHS.items():
+        texts = make_reviews(rng, calls + 1, words)
+        app_module.prediction_cache.clear()
+        results[f'predict_review_{length}'] = measure(
+            [(lambda t=text: app_module.predict_review(t), 1) for text in texts]
+        )
+        for batch_size in BATCH_SIZES:
+            batches = max(2, calls // batch_size)
+            texts = make_reviews(rng, (batches + 1) * batch_size, words)
+            chunks = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+            results[f'predict_batch_{length}_b{batch_size}'] = measure(
+                [(lambda c=chunk: app_module._predict_reviews_uncached(c, batch_size=batch_size), len(chunk)) for chunk in chunks]
+            )
+    return results
+
+
+def bench_cross_check(app_module, rng, calls):
+    client = app_module.app.test_client()
+    hotels = list(app_module.existing_reviews_db)
+    reviews = [make_cross_check_review(rng) for _ in range(calls + 1)]
+    results = {
+        'split_review_into_clauses': measure(
+            [(lambda r=review: app_module.split_review_into_clauses(r), 1) for review in reviews * 20]
+        ),
+    }
+
+    def post(review):
+        response = client.post('/cross-check-review', json={'hotel_name': rng.choice(hotels), 'review_text': review})
+        if response.status_code != 200:
+            raise RuntimeError(f"/cross-check-review returned {response.status_code}: {response.get_data(as_text=True)}")
+
+    # Cold: unseen reviews, so every clause goes through the NLI model. Warm: the same reviews again.
+    results['cross_check_cold'] = measure([(lambda r=review: post(r), 1) for review in reviews])
+    results['cross_check_warm'] = measure([(lambda r=review: post(r), 1) for review in reviews])
+    return results
+
+
+def bench_analyze_file(app_module, rng, row_counts, repeats):
+    client = app_module.app.test_client()
+    results = {}
+
+    def reset():
+        # Every repeat starts as cold as the first: no cached predictions and no indexed texts.
+        app_module.prediction_cache.clear()
+        app_module.near_duplicate_index.clear()
+
+    for rows in row_counts:
+        payload = make_csv(rng, rows)
+        for mode, query in (('json', ''), ('stream', '?stream=1&include_review=0')):
+            def post(payload=payload, query=query):
+                response = client.post(
+                    '/analyze-file' + query,
+                    data={'file': (io.BytesIO(payload), 'reviews.csv')},
+                    content_type='multipart/form-data',
+                )
+                response.get_data()
+                response.close()  # Streamed responses hold their concurrency slot until closed.
+                if response.status_code != 200:
+                    raise RuntimeError(f"/analyze-file returned {response.status_code}")
+            results[f'analyze_file_{mode}_{rows}'] = measure([(post, rows)] * repeats, unit='row', warmup=0, setup=reset)
+    return results
+
+
+def bench_scraper(repeats):
+    """
+    The live extraction path: each saved page is opened over file:// in headless Chromium and
+    its review titles are read with the same in-browser script the scraper runs.
+    """
+    from benchmarks.bench_scraper import load_fixtures
+    from scraper import create_driver, extract_review_titles
+    pages = load_fixtures()
+    driver = create_driver()
+    try:
+        latencies = []
+        with PeakRss() as rss:
+            for path, _ in pages:
+                driver.get('file://' + path)
+                for _ in range(repeats):
+                    started = time.perf_counter()
+                    if not extract_review_titles(driver):
+                        raise RuntimeError(f"No review titles extracted from {os.path.basename(path)}")
+                    latencies.append(time.perf_counter() - started)
+    finally:
+        driver.quit()
+    return {'scraper_extract_page': summarize(latencies, len(latencies), sum(latencies), rss.peak, unit='page')}
+
+
+def bench_load(app_module, rng, concurrency, duration):
+    """Concurrent /predict clients for `duration` seconds; exercises micro-batching."""
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    app_module.prediction_cache.clear()
+
+    def worker(seed):
+        worker_rng = random.Random(seed)
+        client = app_module.app.test_client()
+        own = []
+        i = 0
+        while time.perf_counter() < deadline:
+            text = make_reviews(worker_rng, 1, LENGTHS['medium'])[0] + f" Worker {seed}-{i}."
+            i += 1
+            started = time.perf_counter()
+            response = client.post('/predict', json={'review': text})
+            own.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise RuntimeError(f"/predict returned {response.status_code}")
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=worker, args=(rng.random(),)) for _ in range(concurrency)]
+    with PeakRss() as rss:
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    return {f'load_predict_c{concurrency}': summarize(latencies, len(latencies), elapsed, rss.peak, unit='request')}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def run(models='stub', suites=DEFAULT_SUITES, calls=50, csv_rows=(1000, 10000, 100000), repeats=3,
+        concurrency=8, duration=5.0, seed=0):
+    rng = random.Random(seed)
+    workdir = tempfile.mkdtemp(prefix='verisure-bench-')
+    report = {
+        'meta': {
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'commit': _git_commit(),
+            'models': models,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'seed': seed,
+        },
+        'cases': {},
+    }
+    app_module = None
+    if set(suites) - {'scraper'}:
+        app_module = _import_app(models, workdir)
+        import torch
+        report['meta']['torch'] = torch.__version__
+        report['meta']['torch_threads'] = torch.get_num_threads()
+
+    for suite in suites:
+        print(f"Running {suite}...", file=sys.stderr)
+        if suite == 'predict':
+            cases = bench_predict(app_module, rng, calls)
+        elif suite == 'cross_check':
+            cases = bench_cross_check(app_module, rng, calls)
+        elif suite == 'analyze_file':
+            cases = bench_analyze_file(app_module, rng, csv_rows, repeats)
+        elif suite == 'scraper':
+            cases = bench_scraper(repeats)
+        else:
+            cases = bench_load(app_module, rng, concurrency, duration)
+        report['cases'].update(cases)
+    return report
+
+
+def print_report(report):
+    print(f"{'case':<36} {'throughput':>16} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'peak MB':>9}")
+    for name, case in report['cases'].items():
+        throughput = f"{case['throughput_per_s']:.1f} {case['unit']}/s"
+        print(f"{name:<36} {throughput:>16} {case['p50_ms']:>10.2f} {case['p95_ms']:>10.2f} "
+              f"{case['p99_ms']:>10.2f} {case['peak_rss_mb']:>9.1f}")
+
+
+def _int_list(value):
+    return tuple(int(v) for v in value.split(',') if v.strip())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the prediction, cross-check, file and scraper paths.")
+    parser.add_argument('--models', choices=('stub', 'real'), default='stub',
+                        help="Tiny random stand-in models (default) or the real weights.")
+    parser.add_argument('--suite', action='append', choices=SUITES,
+                        help="Suite to run; repeat to run several. Defaults to all but 'scraper', which needs Chromium.")
+    parser.add_argument('--calls', type=int, default=50, help="Calls per prediction and cross-check case.")
+    parser.add_argument('--csv-rows', type=_int_list, default=(1000, 10000, 100000),
+                        help="Comma-separated synthetic CSV sizes for /analyze-file.")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--concurrency', type=int, default=8, help="Concurrent clients in the /predict load test.")
+    parser.add_argument('--duration', type=float, default=5.0, help="Seconds the /predict load test runs.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='benchmark-results.json')
+    args = parser.parse_args()
+
+    report = run(
+        models=args.models, suites=tuple(args.suite or DEFAULT_SUITES), calls=args.calls, csv_rows=args.csv_rows,
+        repeats=args.repeats, concurrency=args.concurrency, duration=args.duration, seed=args.seed,
+    )
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
+    print(f"Results written to {args.out}")
@@ -0,0 +1,91 @@
+import random
+
+from tokenizers import Tokenizer, models, pre_tokenizers, processors, trainers
+from transformers import (
+    BartConfig,
+    BartForSequenceClassification,
+    PreTrainedTokenizerFast,
+    RobertaConfig,
+    RobertaForSequenceClassification,
+    pipeline,
+)
+
+from engines import TorchEngine
+
+# --- Tiny, randomly initialized stand-ins for the real models ---
+# They share the real models' interfaces (RoBERTa sequence classifier, BART NLI zero-shot pipeline)
+# so every code path runs end to end, but they load instantly and need no network or weights.
+# Absolute latencies are much lower than with the real models; use them to compare code changes.
+
+VOCAB_SIZE = 2000
+SPECIAL_TOKENS = ["<s>", "<pad>", "</s>", "<unk>", "<mask>"]
+MAX_POSITIONS = 514
+
+WORDS = (
+    "the room was clean spacious small noisy quiet staff friendly rude helpful slow fast wifi internet "
+    "signal connection breakfast dinner food tasty cold delicious buffet location parking beach city "
+    "view pool spa service bed comfortable bathroom shower hot water price expensive cheap value stay "
+    "hotel great excellent terrible awful amazing good bad average would recommend never again check in "
+    "out reception lobby manager night day morning walk station airport metro tea coffee restaurant"
+).split()
+
+
+def synthetic_review(rng, words=20):
+    """A random review-like sentence built from hotel vocabulary."""
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def build_stub_tokenizer(seed=0):
+    rng = random.Random(seed)
+    corpus = [synthetic_review(rng, rng.randint(5, 40)) for _ in range(2000)]
+    tokenizer = Tokenizer(models.BPE(unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    trainer = trainers.BpeTrainer(
+        vocab_size=VOCAB_SIZE,
+        special_tokens=SPECIAL_TOKENS,
+        initial_alphabet=pre_tokenizers.ByteLevel.alphabet(),
+        show_progress=False,
+    )
+    tokenizer.train_from_iterator(corpus, trainer)
+    tokenizer.post_processor = processors.RobertaProcessing(("</s>", 2), ("<s>", 0))
+    return PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer,
+        bos_token="<s>", eos_token="</s>", unk_token="<unk>", pad_token="<pad>",
+        mask_token="<mask>", sep_token="</s>", cls_token="<s>",
+        model_max_length=MAX_POSITIONS - 2,
+    )
+
+
+def build_stub_classifier(tokenizer, seed=0):
+    import torch
+    torch.manual_seed(seed)
+    config = RobertaConfig(
+        vocab_size=VOCAB_SIZE, hidden_size=64, num_hidden_layers=2, num_attention_heads=2,
+        intermediate_size=128, max_position_embeddings=MAX_POSITIONS, pad_token_id=1, num_labels=2,
+    )
+    return TorchEngine(model=RobertaForSequenceClassification(config))
+
+
+def build_stub_zero_shot(tokenizer, seed=0):
+    import torch
+    torch.manual_seed(seed)
+    config = BartConfig(
+        vocab_size=VOCAB_SIZE, d_model=64, encoder_layers=2, decoder_layers=2,
+        encoder_attention_heads=2, decoder_attention_heads=2, encoder_ffn_dim=128, decoder_ffn_dim=128,
+        max_position_embeddings=MAX_POSITIONS, pad_token_id=1, bos_token_id=0, eos_token_id=2,
+        decoder_start_token_id=2,
+        label2id={'contradiction': 0, 'neutral': 1, 'entailment': 2},
+        id2label={0: 'contradiction', 1: 'neutral', 2: 'entailment'},
+    )
+    model = BartForSequenceClassification(config).eval()
+    return pipeline('zero-shot-classification', model=model, tokenizer=tokenizer)
+
+
+def install_stub_models(app_module, seed=0):
+    """Swaps the app's model loaders for the stubs. Call before the models are first used."""
+    tokenizer = build_stub_tokenizer(seed)
+    app_module.classifier_slot.loader = lambda: app_module.Classifier(
+        tokenizer, build_stub_classifier(tokenizer, seed), f"stub-{seed}"
+    )
+    app_module.zero_shot_slot.loader = lambda: build_stub_zero_shot(tokenizer, seed)
@@ -0,0 +1,244 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from storage import SQLiteStore
+
+
+def normalize_text(text):
+    """Folds case and collapses whitespace so trivially different copies of a text share a cache key."""
+    return re.sub(r'\s+', ' ', str(text)).strip().casefold()
+
+
+def text_key(text, namespace=''):
+    """Content address of a text: a hash of its normalized form plus a namespace (model / label-set version)."""
+    return hashlib.sha256(f"{namespace}\x00{normalize_text(text)}".encode('utf-8')).hexdigest()
+
+
+WEIGHT_SUFFIXES = ('.safetensors', '.bin', '.pt', '.pth', '.onnx', '.h5', '.msgpack')
+SAMPLE_BYTES = 1 << 16
+
+
+def _hash_weight_file(digest, f, size):
+    # Weight files are large and may be memory-mapped, so only their size and a few sampled blocks
+    # are hashed. Retraining rewrites practically every block, so the samples still change.
+    digest.update(str(size).encode('utf-8'))
+    for offset in (0, size // 2, max(0, size - SAMPLE_BYTES)):
+        f.seek(offset)
+        digest.update(f.read(SAMPLE_BYTES))
+
+
+def file_fingerprint(path, extra=''):
+    """
+    Hashes the config and weight files of a model directory (or a single file), so caches
+    keyed on it are invalidated whenever the model is retrained or replaced. Weight files
+    contribute their size and sampled blocks rather than their whole contents.
+    """
+    digest = hashlib.sha256(extra.encode('utf-8'))
+    paths = [path]
+    if os.path.isdir(path):
+        paths = [os.path.join(path, name) for name in sorted(os.listdir(path))]
+    for file_path in paths:
+        if not os.path.isfile(file_path):
+            continue
+        digest.update(os.path.basename(file_path).encode('utf-8'))
+        with open(file_path, 'rb') as f:
+            if file_path.endswith(WEIGHT_SUFFIXES):
+                _hash_weight_file(digest, f, os.fstat(f.fileno()).st_size)
+                continue
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+class LRUCache:
+    """
+    A thread-safe, size-bounded least-recently-used cache with hit/miss/eviction counters.
+    If `ttl_seconds` is set, entries older than that are treated as misses and dropped.
+    """
+
+    def __init__(self, max_items=10000, ttl_seconds=None):
+        self.max_items = max(1, int(max_items))
+        self.ttl_seconds = ttl_seconds
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                value, expires_at = self._data[key]
+                if expires_at is not None and expires_at <= time.monotonic():
+                    del self._data[key]
+                    self.expirations += 1
+                else:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'max_items': self.max_items,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+class AnnotationCache(SQLiteStore):
+    """
+    Two-tier cache for zero-shot (aspect, sentiment, scores) annotations.
+
+    Tier 1 is an in-memory LRU; tier 2 is a SQLite file that survives restarts and is shared by
+    every worker on the host. Entries are keyed by `text_key(text, namespace)`, where the namespace
+    identifies the model and label set, so changing either never serves stale annotations.
+    """
+
+    label = 'Annotation cache'
+    # A read-only filesystem should not take cross-checks down; we just lose the disk tier.
+    memory_fallback = False
+
+    def __init__(self, db_path, namespace, max_memory_items=10000):
+        self.namespace = namespace
+        self.memory = LRUCache(max_memory_items)
+        self.disk_hits = 0
+        self.disk_errors = 0
+        super().__init__(db_path)
+
+    def _setup(self):
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS annotations ("
+            " key TEXT PRIMARY KEY,"
+            " text TEXT NOT NULL,"
+            " aspect TEXT NOT NULL,"
+            " sentiment TEXT NOT NULL,"
+            " scores TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def key(self, text):
+        return text_key(text, self.namespace)
+
+    def get_many(self, texts):
+        """Returns {text: annotation} for every text that is cached in memory or on disk."""
+        found = {}
+        missing = {}
+        for text in texts:
+            annotation = self.memory.get(self.key(text))
+            if annotation is not None:
+                found[text] = annotation
+            else:
+                missing.setdefault(self.key(text), []).append(text)
+
+        if missing and self._conn is not None:
+            keys = list(missing)
+            try:
+                with self._lock:
+                    rows = []
+                    # Stay well below SQLite's bound-parameter limit.
+                    for start in range(0, len(keys), 500):
+                        chunk = keys[start:start + 500]
+                        placeholders = ','.join('?' * len(chunk))
+                        rows.extend(self._conn.execute(
+                            f"SELECT key, aspect, sentiment, scores FROM annotations WHERE key IN ({placeholders})", chunk
+                        ).fetchall())
+            except sqlite3.Error as e:
+                print(f"Annotation cache: disk read failed ({e})")
+                self.disk_errors += 1
+                rows = []
+            for key, aspect, sentiment, scores in rows:
+                annotation = {'aspect': aspect, 'sentiment': sentiment, 'scores': json.loads(scores)}
+                self.memory.put(key, annotation)
+                self.disk_hits += 1
+                for text in missing[key]:
+                    found[text] = annotation
+        return found
+
+    def put_many(self, annotations):
+        """Stores {text: annotation} in both tiers."""
+        rows = []
+        now = time.time()
+        for text, annotation in annotations.items():
+            key = self.key(text)
+            self.memory.put(key, annotation)
+            rows.append((key, text, annotation['aspect'], annotation['sentiment'], json.dumps(annotation['scores']), now))
+
+        if rows and self._conn is not None:
+            try:
+                with self._lock:
+                    self._conn.executemany("INSERT OR REPLACE INTO annotations VALUES (?, ?, ?, ?, ?, ?)", rows)
+                    self._conn.commit()
+            except sqlite3.Error as e:
+                print(f"Annotation cache: disk write failed ({e})")
+                self.disk_errors += 1
+
+    def iter_disk(self, batch_size=1000):
+        """Yields (text, aspect, sentiment) for every stored annotation of this namespace."""
+        if self._conn is None:
+            return
+        last_rowid = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT rowid, key, text, aspect, sentiment FROM annotations WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                    (last_rowid, batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            for rowid, key, text, aspect, sentiment in rows:
+                # Keys embed the namespace, so rows from other models or label sets do not match.
+                if key == self.key(text):
+                    yield text, aspect, sentiment
+            last_rowid = rows[-1][0]
+
+    def disk_size(self):
+        if self._conn is None:
+            return 0
+        try:
+            with self._lock:
+                return self._conn.execute("SELECT COUNT(*) FROM annotations").fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def stats(self):
+        return {
+            'namespace': self.namespace,
+            'db_path': self.db_path if self._conn is not None else None,
+            'memory': self.memory.stats(),
+            'disk_hits': self.disk_hits,
+            'disk_errors': self.disk_errors,
+            'disk_size': self.disk_size(),
+        }
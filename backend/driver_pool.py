@@ -0,0 +1,168 @@
+import atexit
+import threading
+import time
+from contextlib import contextmanager
+
+from scraper import create_driver
+
+
+class PoolTimeout(RuntimeError):
+    """Raised when no browser could be leased within the acquire timeout."""
+
+
+class _PooledDriver:
+    def __init__(self, driver):
+        self.driver = driver
+        self.uses = 0
+        self.created_at = time.time()
+
+
+class DriverPool:
+    """
+    A bounded pool of headless Chromium drivers shared by scrape requests.
+
+    At most `size` browsers exist at once; extra requests wait in `lease()` for up to
+    `acquire_timeout` seconds instead of launching more browsers. Browsers are started
+    lazily, health-checked before every lease, reset (cookies, storage, blank page) after
+    every lease, and recycled after `max_uses` leases or as soon as they crash.
+    """
+
+    def __init__(self, size=2, max_uses=20, acquire_timeout=60, factory=create_driver):
+        self.size = max(1, int(size))
+        self.max_uses = max(1, int(max_uses))
+        self.acquire_timeout = acquire_timeout
+        self.factory = factory
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._idle = []
+        self._closed = False
+
+        # --- Stats ---
+        self.leases = 0
+        self.launches = 0
+        self.recycled = 0
+        self.crashed = 0
+        self.timeouts = 0
+        self.in_use = 0
+        self.waiting = 0
+        atexit.register(self.close)
+
+    @staticmethod
+    def _is_healthy(driver):
+        try:
+            driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _quit(driver):
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _reset(driver):
+        """Clears per-lease browser state so one scrape cannot leak into the next."""
+        driver.delete_all_cookies()
+        try:
+            driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+        except Exception:
+            # Storage is not accessible on every page (e.g. about:blank or error pages).
+            pass
+        driver.get("about:blank")
+
+    def _checkout(self):
+        while True:
+            with self._lock:
+                pooled = self._idle.pop() if self._idle else None
+            if pooled is None:
+                print("Driver pool: launching a new browser...")
+                pooled = _PooledDriver(self.factory())
+                with self._lock:
+                    self.launches += 1
+                return pooled
+            if self._is_healthy(pooled.driver):
+                return pooled
+            print("Driver pool: discarding a browser that failed its health check.")
+            self._quit(pooled.driver)
+            with self._lock:
+                self.crashed += 1
+
+    def _checkin(self, pooled, broken):
+        pooled.uses += 1
+        if not broken and pooled.uses < self.max_uses and not self._closed:
+            try:
+                self._reset(pooled.driver)
+                with self._lock:
+                    self._idle.append(pooled)
+                return
+            except Exception as e:
+                print(f"Driver pool: browser reset failed ({e}).")
+                broken = True
+        self._quit(pooled.driver)
+        with self._lock:
+            if broken:
+                self.crashed += 1
+            else:
+                self.recycled += 1
+
+    @contextmanager
+    def lease(self, timeout=None):
+        """
+        Leases a browser for the duration of the `with` block.
+        Raises PoolTimeout if none becomes free within `timeout` (defaults to acquire_timeout).
+        """
+        timeout = self.acquire_timeout if timeout is None else timeout
+        with self._lock:
+            self.waiting += 1
+        acquired = self._slots.acquire(timeout=timeout)
+        with self._lock:
+            self.waiting -= 1
+            if not acquired:
+                self.timeouts += 1
+        if not acquired:
+            raise PoolTimeout(f"No scraper browser became free within {timeout}s.")
+
+        pooled = None
+        broken = False
+        try:
+            pooled = self._checkout()
+            with self._lock:
+                self.leases += 1
+                self.in_use += 1
+            yield pooled.driver
+        except Exception:
+            # A failing scrape may have left the browser wedged; the health check decides.
+            broken = pooled is not None and not self._is_healthy(pooled.driver)
+            raise
+        finally:
+            if pooled is not None:
+                with self._lock:
+                    self.in_use -= 1
+                self._checkin(pooled, broken)
+            self._slots.release()
+
+    def close(self):
+        """Quits every idle browser. Leased browsers are quit when they are returned."""
+        self._closed = True
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for pooled in idle:
+            self._quit(pooled.driver)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': self.size,
+                'max_uses': self.max_uses,
+                'idle': len(self._idle),
+                'in_use': self.in_use,
+                'waiting': self.waiting,
+                'leases': self.leases,
+                'launches': self.launches,
+                'recycled': self.recycled,
+                'crashed': self.crashed,
+                'timeouts': self.timeouts,
+            }
@@ -0,0 +1,191 @@
+import argparse
+import os
+import time
+
+import torch
+import torch.nn.functional as F
+from transformers import AutoTokenizer, RobertaForSequenceClassification
+
+from model_memory import load_sequence_classifier
+
+# --- Inference engines for the fake/real classifier ---
+# Every engine takes tokenized inputs (a dict of "pt" tensors) and returns class logits
+# (predict_logits) or probabilities (predict_proba).
+# Backends: "torch" (eager fp32, default), "onnx" (ONNX Runtime graph) and "onnx-int8"
+# (ONNX graph with dynamically int8-quantized weights). ONNX artifacts live next to the model.
+
+BACKENDS = ('torch', 'onnx', 'onnx-int8')
+ONNX_DIR_NAME = 'onnx'
+ONNX_FILES = {'onnx': 'model.onnx', 'onnx-int8': 'model.int8.onnx'}
+
+DEFAULT_SAMPLE = [
+    "Great stay, the staff were friendly and the room was spotless.",
+    "Best hotel ever!!! Amazing amazing amazing, book now, you will not regret it!!!",
+    "The WiFi kept dropping and breakfast was cold, but the location was convenient.",
+    "Absolutely perfect in every way, five stars, highly recommend to everyone.",
+    "Check-in took forty minutes and nobody apologised. The bed was comfortable though.",
+    "Excellent",
+    "Room service forgot half of our order and still charged us for it.",
+    "I had the best paneer tikka of my life at their restaurant.",
+]
+
+
+def onnx_path(model_path, backend):
+    return os.path.join(model_path, ONNX_DIR_NAME, ONNX_FILES[backend])
+
+
+class TorchEngine:
+    """Eager PyTorch inference (the original behaviour)."""
+
+    name = 'torch'
+
+    def __init__(self, model_path=None, model=None, use_mmap=False):
+        if model is None:
+            model = load_sequence_classifier(model_path, use_mmap=use_mmap, model_cls=RobertaForSequenceClassification)
+        self.model = model.eval()
+
+    def predict_logits(self, inputs):
+        with torch.no_grad():
+            return self.model(**inputs).logits
+
+    def predict_proba(self, inputs):
+        return F.softmax(self.predict_logits(inputs), dim=1)
+
+
+class OnnxEngine:
+    """ONNX Runtime inference on CPU over an exported (optionally int8-quantized) graph."""
+
+    def __init__(self, model_path, backend='onnx'):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise RuntimeError(f'The "{backend}" backend needs onnxruntime: pip install onnxruntime') from e
+
+        path = onnx_path(model_path, backend)
+        if not os.path.exists(path):
+            raise RuntimeError(f'{path} not found. Run "python engines.py export" first.')
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = int(os.environ.get('ORT_INTRA_OP_THREADS', torch.get_num_threads()))
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+        self.input_names = [node.name for node in self.session.get_inputs()]
+        self.name = backend
+
+    def predict_logits(self, inputs):
+        feed = {name: inputs[name].cpu().numpy().astype('int64') for name in self.input_names}
+        return torch.from_numpy(self.session.run(['logits'], feed)[0])
+
+    def predict_proba(self, inputs):
+        return F.softmax(self.predict_logits(inputs), dim=1)
+
+
+def load_engine(backend, model_path, use_mmap=False):
+    """Builds the engine for a backend name (see BACKENDS). use_mmap memory-maps the PyTorch weights."""
+    if backend == 'torch':
+        return TorchEngine(model_path, use_mmap=use_mmap)
+    if backend in ONNX_FILES:
+        return OnnxEngine(model_path, backend)
+    raise ValueError(f'Unknown inference backend "{backend}". Choose one of: {", ".join(BACKENDS)}')
+
+
+# --- Export / quantize ---
+def export_onnx(model_path, opset=17):
+    """Exports the classifier to ONNX and writes a dynamically int8-quantized copy next to it."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    output_dir = os.path.join(model_path, ONNX_DIR_NAME)
+    os.makedirs(output_dir, exist_ok=True)
+    fp32_path = onnx_path(model_path, 'onnx')
+    int8_path = onnx_path(model_path, 'onnx-int8')
+
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    model = RobertaForSequenceClassification.from_pretrained(model_path)
+    model.eval()
+    dummy = tokenizer(DEFAULT_SAMPLE[:2], return_tensors='pt', padding=True)
+
+    print(f"Exporting ONNX graph to {fp32_path}...")
+    torch.onnx.export(
+        model,
+        (dummy['input_ids'], dummy['attention_mask']),
+        fp32_path,
+        input_names=['input_ids', 'attention_mask'],
+        output_names=['logits'],
+        dynamic_axes={
+            'input_ids': {0: 'batch', 1: 'sequence'},
+            'attention_mask': {0: 'batch', 1: 'sequence'},
+            'logits': {0: 'batch'},
+        },
+        opset_version=opset,
+        do_constant_folding=True,
+    )
+
+    print(f"Writing int8-quantized graph to {int8_path}...")
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    print("Export complete.")
+
+
+# --- Parity check ---
+def load_sample(sample_path=None, limit=500):
+    if not sample_path:
+        return list(DEFAULT_SAMPLE)
+    import pandas as pd
+    df = pd.read_csv(sample_path, usecols=['review'], nrows=limit)
+    return [review for review in df['review'].fillna('') if isinstance(review, str) and review.strip()]
+
+
+def parity_check(model_path, backend, texts, batch_size=32):
+    """Compares a backend against eager PyTorch and reports label agreement and probability drift."""
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    reference = TorchEngine(model_path)
+    candidate = load_engine(backend, model_path)
+
+    ref_probs, cand_probs = [], []
+    timings = {'torch': 0.0, backend: 0.0}
+    for start in range(0, len(texts), batch_size):
+        inputs = tokenizer(texts[start:start + batch_size], return_tensors='pt', padding=True, truncation=True, max_length=256)
+        started = time.perf_counter()
+        ref_probs.append(reference.predict_proba(inputs))
+        timings['torch'] += time.perf_counter() - started
+        started = time.perf_counter()
+        cand_probs.append(candidate.predict_proba(inputs))
+        timings[backend] += time.perf_counter() - started
+
+    ref_probs = torch.cat(ref_probs)
+    cand_probs = torch.cat(cand_probs)
+    drift = (ref_probs - cand_probs).abs()
+    return {
+        'backend': backend,
+        'samples': len(texts),
+        'label_agreement': (ref_probs.argmax(dim=1) == cand_probs.argmax(dim=1)).float().mean().item(),
+        'max_probability_drift': drift.max().item(),
+        'mean_probability_drift': drift.mean().item(),
+        'seconds': timings,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export and check alternative inference backends for the fake/real classifier.")
+    parser.add_argument('--model-path', default='./final_model_distilroberta')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help="Export the ONNX graph and its int8-quantized variant.")
+    export_parser.add_argument('--opset', type=int, default=17)
+
+    parity_parser = subparsers.add_parser('parity', help="Compare a backend against eager PyTorch on a sample set.")
+    parity_parser.add_argument('--backend', choices=[b for b in BACKENDS if b != 'torch'], default='onnx-int8')
+    parity_parser.add_argument('--sample', help="CSV with a 'review' column (defaults to a small built-in sample).")
+    parity_parser.add_argument('--limit', type=int, default=500)
+
+    args = parser.parse_args()
+    if args.command == 'export':
+        export_onnx(args.model_path, opset=args.opset)
+    else:
+        report = parity_check(args.model_path, args.backend, load_sample(args.sample, args.limit))
+        print(f"Backend: {report['backend']}")
+        print(f"Samples: {report['samples']}")
+        print(f"Label agreement: {report['label_agreement'] * 100:.2f}%")
+        print(f"Max probability drift: {report['max_probability_drift']:.6f}")
+        print(f"Mean probability drift: {report['mean_probability_drift']:.6f}")
+        for name, seconds in report['seconds'].items():
+            print(f"Time ({name}): {seconds:.3f}s")
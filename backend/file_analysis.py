@@ -0,0 +1,91 @@
+import gzip
+import os
+
+import pandas as pd
+
+# --- Chunked CSV ingestion and incremental result files for /analyze-file ---
+
+RESULT_FORMATS = {'csv': '.csv.gz', 'parquet': '.parquet'}
+RESULT_COLUMNS = ['row', 'review', 'prediction', 'confidence_score', 'near_duplicate_cluster', 'cluster_size']
+# Raised by pandas for empty, malformed or non-UTF-8 uploads; callers turn these into a 400.
+CSV_ERRORS = (pd.errors.EmptyDataError, pd.errors.ParserError, UnicodeDecodeError)
+
+
+def has_review_column(file_obj):
+    """Reads only the CSV header and rewinds the file."""
+    columns = pd.read_csv(file_obj, nrows=0).columns
+    file_obj.seek(0)
+    return 'review' in columns
+
+
+def iter_review_chunks(file_obj, chunksize=5000):
+    """
+    Reads the 'review' column of a CSV `chunksize` rows at a time, so memory stays bounded by
+    the chunk size. Yields lists of (row_number, review) with empty or non-text reviews skipped.
+    """
+    row_offset = 0
+    # dtype=str keeps numeric-looking reviews as text instead of inferring numbers per chunk.
+    for chunk in pd.read_csv(file_obj, usecols=['review'], dtype={'review': str}, chunksize=chunksize):
+        rows = []
+        for i, review in enumerate(chunk['review']):
+            if isinstance(review, str) and review.strip():
+                rows.append((row_offset + i, review))
+        row_offset += len(chunk)
+        yield rows
+
+
+class ResultWriter:
+    """
+    Appends classified rows to a gzip-compressed CSV or a Parquet file, one chunk at a time.
+    """
+
+    def __init__(self, path, result_format='csv'):
+        if result_format not in RESULT_FORMATS:
+            raise ValueError(f'Unknown result format "{result_format}". Choose one of: {", ".join(RESULT_FORMATS)}')
+        self.path = path
+        self.format = result_format
+        self.rows_written = 0
+        self._file = None
+        self._parquet_writer = None
+
+    def write(self, rows):
+        """rows: list of dicts with the RESULT_COLUMNS keys."""
+        if not rows:
+            return
+        df = pd.DataFrame(rows, columns=RESULT_COLUMNS)
+        # Reviews too short to cluster have no cluster id; keep the column integer-typed anyway.
+        df['near_duplicate_cluster'] = df['near_duplicate_cluster'].astype('Int64')
+        if self.format == 'csv':
+            if self._file is None:
+                self._file = gzip.open(self.path, 'wt', encoding='utf-8', newline='')
+                df.to_csv(self._file, index=False)
+            else:
+                df.to_csv(self._file, index=False, header=False)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.path, table.schema, compression='snappy')
+            self._parquet_writer.write_table(table)
+        self.rows_written += len(rows)
+
+    def close(self):
+        if self.rows_written == 0:
+            # Still produce a valid, empty result file.
+            if self.format == 'csv':
+                with gzip.open(self.path, 'wt', encoding='utf-8', newline='') as f:
+                    f.write(','.join(RESULT_COLUMNS) + '\n')
+            else:
+                pd.DataFrame(columns=RESULT_COLUMNS).to_parquet(self.path, index=False)
+        if self._file is not None:
+            self._file.close()
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+
+def remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
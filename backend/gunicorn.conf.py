@@ -0,0 +1,47 @@
+import os
+
+# --- Production server: pre-forked gunicorn workers sharing one copy of the model weights ---
+# The app (and with it the models) is loaded once in the master; forked workers share those
+# pages copy-on-write. Each worker then gets its own slice of the CPU cores for torch, its own
+# SQLite connections and background threads (see preload_models / after_fork in app.py).
+#
+#   gunicorn -c gunicorn.conf.py app:app
+
+os.environ['SERVER_PREFORK'] = '1'
+# Tokenizers must not start their Rust thread pool in the master; it would not survive the fork.
+os.environ.setdefault('TOKENIZERS_PARALLELISM', 'false')
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 7860)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', max(1, min(4, (os.cpu_count() or 1) // 2))))
+worker_class = 'gthread'
+preload_app = True
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+
+# Every accepted request gets a thread: the inference slots and their queue (WORKER_MAX_CONCURRENCY,
+# WORKER_MAX_QUEUE), the /predict slots and their queue (PREDICT_MAX_CONCURRENCY, PREDICT_MAX_QUEUE),
+# the scrape requests that wait on the scrape executor (SCRAPE_WORKERS, SCRAPE_QUEUE_SIZE) and two
+# spare threads for health checks and metrics. Connections beyond that stay in the listen backlog,
+# where any idle worker can pick them up. Defaults match app.py.
+threads = (
+    int(os.environ.get('WORKER_MAX_CONCURRENCY', 4)) + int(os.environ.get('WORKER_MAX_QUEUE', 8))
+    + int(os.environ.get('PREDICT_MAX_CONCURRENCY', os.environ.get('BATCH_MAX_SIZE', 32)))
+    + int(os.environ.get('PREDICT_MAX_QUEUE', 8))
+    + int(os.environ.get('SCRAPE_WORKERS', os.environ.get('SCRAPER_POOL_SIZE', 2)))
+    + int(os.environ.get('SCRAPE_QUEUE_SIZE', 4)) + 2
+)
+worker_connections = threads
+# An idle keep-alive connection would count against worker_connections; the proxy in front reuses its own.
+keepalive = 0
+
+
+def on_starting(server):
+    # Runs in the master after the app is imported and before the port is bound, so no request
+    # is accepted until the models are in memory.
+    import app
+    app.preload_models()
+
+
+def post_fork(server, worker):
+    import app
+    app.after_fork(workers=server.cfg.workers)
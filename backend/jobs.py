@@ -0,0 +1,140 @@
+import threading
+import time
+import uuid
+
+
+class Job:
+    """
+    A long-running background task whose results are appended as they are produced.
+    Readers can poll a snapshot or follow the results as a stream.
+    """
+
+    def __init__(self, kind, params=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params or {}
+        self.status = 'queued'
+        self.error = None
+        self.progress = {}
+        self.results = []
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.finished_at = None
+        self._cond = threading.Condition()
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed')
+
+    def start(self):
+        with self._cond:
+            self.status = 'running'
+            self.updated_at = time.time()
+            self._cond.notify_all()
+
+    def update_progress(self, **progress):
+        with self._cond:
+            self.progress.update(progress)
+            self.updated_at = time.time()
+            self._cond.notify_all()
+
+    def add_results(self, results):
+        with self._cond:
+            self.results.extend(results)
+            self.updated_at = time.time()
+            self._cond.notify_all()
+
+    def finish(self, error=None):
+        with self._cond:
+            self.status = 'failed' if error else 'done'
+            self.error = error
+            self.finished_at = self.updated_at = time.time()
+            self._cond.notify_all()
+
+    def snapshot(self, offset=0):
+        with self._cond:
+            return {
+                'job_id': self.id,
+                'kind': self.kind,
+                'params': self.params,
+                'status': self.status,
+                'error': self.error,
+                'progress': dict(self.progress),
+                'created_at': self.created_at,
+                'updated_at': self.updated_at,
+                'finished_at': self.finished_at,
+                'total_results': len(self.results),
+                'offset': offset,
+                'results': self.results[offset:],
+            }
+
+    def follow(self, heartbeat=15):
+        """
+        Yields ('result', item) for every result, including ones produced before the call, then
+        ('status', snapshot) when the job finishes. Yields ('heartbeat', None) while idle.
+        """
+        sent = 0
+        while True:
+            with self._cond:
+                if sent >= len(self.results) and not self.finished:
+                    self._cond.wait(timeout=heartbeat)
+                pending = self.results[sent:]
+                finished = self.finished
+            if pending:
+                sent += len(pending)
+                for item in pending:
+                    yield 'result', item
+            elif finished:
+                snapshot = self.snapshot(offset=sent)
+                snapshot.pop('results')
+                yield 'status', snapshot
+                return
+            else:
+                yield 'heartbeat', None
+
+
+class JobStore:
+    """
+    Keeps recent jobs in memory. Finished jobs are dropped after `ttl_seconds`, and the
+    oldest finished jobs are dropped first once more than `max_jobs` are stored.
+    `on_evict(job)` is called for every dropped job, e.g. to delete its result file.
+    """
+
+    def __init__(self, max_jobs=200, ttl_seconds=3600, on_evict=None):
+        self.max_jobs = max_jobs
+        self.ttl_seconds = ttl_seconds
+        self.on_evict = on_evict
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, kind, params=None):
+        job = Job(kind, params)
+        with self._lock:
+            self._evict()
+            self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _evict(self):
+        now = time.time()
+        evicted = [j for j in self._jobs.values() if j.finished and now - j.finished_at > self.ttl_seconds]
+        for job in evicted:
+            del self._jobs[job.id]
+        finished = sorted((j for j in self._jobs.values() if j.finished), key=lambda j: j.finished_at)
+        while len(self._jobs) >= self.max_jobs and finished:
+            job = finished.pop(0)
+            del self._jobs[job.id]
+            evicted.append(job)
+        if self.on_evict is not None:
+            for job in evicted:
+                self.on_evict(job)
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return {'jobs': len(self._jobs), 'by_status': counts}
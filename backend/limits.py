@@ -0,0 +1,198 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from storage import SQLiteStore
+
+
+class Overloaded(RuntimeError):
+    """Raised when work is turned away because a bounded queue is full."""
+
+
+class ConcurrencyLimiter:
+    """
+    Lets at most `max_active` callers in at once. Up to `max_waiting` more wait (for at most
+    `wait_timeout` seconds) for a free slot; anyone beyond that is turned away immediately, so an
+    overloaded worker answers quickly instead of letting requests pile up behind the models.
+    """
+
+    def __init__(self, max_active, max_waiting=0, wait_timeout=30, name="limiter"):
+        self.max_active = max(1, int(max_active))
+        self.max_waiting = max(0, int(max_waiting))
+        self.wait_timeout = wait_timeout
+        self.name = name
+        self._cond = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+
+        # --- Stats ---
+        self.admitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.max_waiting_seen = 0
+
+    def acquire(self):
+        """Takes a slot, waiting if the queue has room. Returns False if the caller was turned away."""
+        with self._cond:
+            if self.active < self.max_active and not self.waiting:
+                self.active += 1
+                self.admitted += 1
+                return True
+            if self.waiting >= self.max_waiting:
+                self.rejected += 1
+                return False
+            self.waiting += 1
+            self.max_waiting_seen = max(self.max_waiting_seen, self.waiting)
+            try:
+                admitted = self._cond.wait_for(lambda: self.active < self.max_active, timeout=self.wait_timeout)
+            finally:
+                self.waiting -= 1
+            if not admitted:
+                self.timeouts += 1
+                return False
+            self.active += 1
+            self.admitted += 1
+            return True
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'max_active': self.max_active,
+                'max_waiting': self.max_waiting,
+                'active': self.active,
+                'waiting': self.waiting,
+                'max_waiting_seen': self.max_waiting_seen,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+            }
+
+
+class BoundedExecutor:
+    """
+    A thread pool with a bounded backlog: at most `max_workers` tasks run and `max_queue` wait;
+    `submit` raises Overloaded beyond that instead of queueing without limit.
+    """
+
+    def __init__(self, max_workers, max_queue=0, name="executor"):
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue = max(0, int(max_queue))
+        self.name = name
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue)
+        self._lock = threading.Lock()
+        self.pending = 0
+
+        # --- Stats ---
+        self.submitted = 0
+        self.rejected = 0
+
+    def submit(self, fn, *args, **kwargs):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise Overloaded(f"{self.name}: {self.max_workers} running and {self.max_queue} queued tasks")
+        with self._lock:
+            self.submitted += 1
+            self.pending += 1
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._done(None)
+            raise
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self.pending -= 1
+        self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'pending': self.pending,
+                'submitted': self.submitted,
+                'rejected': self.rejected,
+            }
+
+
+class DomainRateLimiter(SQLiteStore):
+    """
+    A token bucket per host name, so requests to one site are paced without slowing others: `rate`
+    requests per second on average, with bursts of up to `burst`. The buckets live in SQLite, so
+    the rate holds for all worker processes on the host together. `acquire` reserves a token and
+    sleeps until it is due, so waiting callers are served in order.
+    """
+
+    label = 'Rate limiter'
+    autocommit = True
+
+    def __init__(self, db_path, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+
+        # --- Stats (this process) ---
+        self.acquired = 0
+        self.delayed = 0
+        self.wait_seconds = 0.0
+        super().__init__(db_path)
+
+    def _setup(self):
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_buckets ("
+            " domain TEXT PRIMARY KEY,"
+            " tokens REAL NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+
+    def _reserve(self, domain):
+        """Takes a token from the domain's bucket, which may go negative, and returns the seconds until it is due."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Wall-clock time, since the buckets are shared between processes.
+                now = time.time()
+                row = self._conn.execute("SELECT tokens, updated_at FROM rate_buckets WHERE domain = ?", (domain,)).fetchone()
+                tokens = self.burst if row is None else min(self.burst, row[0] + max(0.0, now - row[1]) * self.rate)
+                tokens -= 1
+                self._conn.execute("INSERT OR REPLACE INTO rate_buckets VALUES (?, ?, ?)", (domain, tokens, now))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return -tokens / self.rate if tokens < 0 else 0.0
+
+    def acquire(self, url):
+        """Waits for the URL's host to allow another request. A rate of 0 disables the limiter."""
+        if self.rate <= 0:
+            return 0.0
+        wait = self._reserve((urlsplit(url).hostname or '').lower())
+        if wait:
+            time.sleep(wait)
+        with self._lock:
+            self.acquired += 1
+            self.delayed += int(wait > 0)
+            self.wait_seconds += wait
+        return wait
+
+    def stats(self):
+        with self._lock:
+            domains = self._conn.execute("SELECT COUNT(*) FROM rate_buckets").fetchone()[0]
+            return {
+                'rate_per_domain': self.rate,
+                'burst': self.burst,
+                'db_path': self.db_path,
+                'domains': domains,
+                'acquired': self.acquired,
+                'delayed': self.delayed,
+                'wait_seconds': self.wait_seconds,
+            }
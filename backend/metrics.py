@@ -0,0 +1,217 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# --- Minimal in-process metrics with Prometheus text exposition ---
+# Counters and histograms are kept per process. Stage timings recorded with `stage()` also
+# feed the optional per-request Server-Timing header when a request is being tracked on
+# the current thread.
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(self.labelnames, key, ('le', _format_value(bound)))
+                    lines.append(f'{self.name}_bucket{labels} {cumulative}')
+                lines.append(f'{self.name}_sum{_format_labels(self.labelnames, key)} {total!r}')
+                lines.append(f'{self.name}_count{_format_labels(self.labelnames, key)} {count}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help_text, labelnames=()):
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector):
+        """
+        Registers a callable returning [(name, type, help, [(labels_dict, value), ...]), ...],
+        evaluated at scrape time. Used to export gauges from existing stats() methods.
+        """
+        self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                print(f"Metrics collector failed: {e}")
+                continue
+            for name, metric_type, help_text, samples in families:
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {metric_type}')
+                for labels, value in samples:
+                    label_names = tuple(labels)
+                    label_values = tuple(labels[n] for n in label_names)
+                    lines.append(f'{name}{_format_labels(label_names, label_values)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'verisure_stage_seconds',
+    'Latency of individual hot-path stages (tokenization, model forward, scraping steps, ...).',
+    labelnames=('stage',),
+)
+HTTP_REQUESTS = REGISTRY.counter(
+    'verisure_http_requests_total',
+    'HTTP requests by endpoint, method and status code.',
+    labelnames=('endpoint', 'method', 'status'),
+)
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'verisure_http_request_seconds',
+    'Time to produce the HTTP response (streamed bodies are not included).',
+    labelnames=('endpoint', 'method'),
+)
+
+# --- Per-request stage timings (for Server-Timing) ---
+_request_local = threading.local()
+
+
+def begin_request():
+    _request_local.timings = []
+    _request_local.started = time.perf_counter()
+
+
+def end_request():
+    """Returns (total_seconds, [(stage, seconds), ...]) for the request tracked on this thread."""
+    timings = getattr(_request_local, 'timings', None)
+    started = getattr(_request_local, 'started', None)
+    _request_local.timings = None
+    _request_local.started = None
+    if started is None:
+        return None, []
+    return time.perf_counter() - started, timings or []
+
+
+@contextmanager
+def stage(name):
+    """Times a block, records it in the stage histogram and in the current request's timings."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        timings = getattr(_request_local, 'timings', None)
+        if timings is not None:
+            timings.append((name, elapsed))
+
+
+@contextmanager
+def collect_stages():
+    """
+    Collects the stages timed on this thread inside the block into a fresh list (yielded), e.g.
+    on a worker thread that runs a batch for several requests. The previous list is restored after.
+    """
+    previous = getattr(_request_local, 'timings', None)
+    _request_local.timings = collected = []
+    try:
+        yield collected
+    finally:
+        _request_local.timings = previous
+
+
+def record_timings(timings):
+    """Adds stage timings measured on another thread to the current request's timings."""
+    current = getattr(_request_local, 'timings', None)
+    if current is not None:
+        current.extend(timings)
+
+
+def server_timing_header(total, timings):
+    """Builds a Server-Timing header value; repeated stages are summed."""
+    totals = {}
+    for name, seconds in timings:
+        totals[name] = totals.get(name, 0.0) + seconds
+    parts = [f'{name};dur={seconds * 1000:.2f}' for name, seconds in totals.items()]
+    if total is not None:
+        parts.append(f'total;dur={total * 1000:.2f}')
+    return ', '.join(parts)
+
+
+# --- Sampling profiler switch ---
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', './cache/profiles')
@@ -0,0 +1,183 @@
+import contextlib
+import glob
+import json
+import mmap
+import os
+import struct
+
+import torch
+
+# --- Memory-budget helpers: reduced-precision and memory-mapped model loading, memory reports ---
+# With mmap loading, weights stay backed by the safetensors file: pages are read in lazily on
+# first use, are shared by every process that maps the same file (e.g. pre-forked workers) and
+# can be dropped by the kernel under memory pressure instead of being swapped.
+
+DTYPES = ('fp32', 'bf16', 'int8')
+_SAFETENSORS_DTYPES = {
+    'F64': torch.float64, 'F32': torch.float32, 'F16': torch.float16, 'BF16': torch.bfloat16,
+    'I64': torch.int64, 'I32': torch.int32, 'I16': torch.int16, 'I8': torch.int8, 'U8': torch.uint8,
+    'BOOL': torch.bool,
+}
+
+
+def _no_init_weights():
+    """Skips random weight initialization when building a model whose weights are loaded next."""
+    try:
+        from transformers.modeling_utils import no_init_weights
+    except ImportError:
+        try:
+            from transformers.initialization import no_init_weights
+        except ImportError:
+            return contextlib.nullcontext()
+    return no_init_weights()
+
+
+def mmap_safetensors(path):
+    """
+    Returns {name: tensor} whose storage is a private (copy-on-write) mapping of the file,
+    so nothing is read from disk until a tensor is actually used.
+    """
+    with open(path, 'rb') as f:
+        header_size = struct.unpack('<Q', f.read(8))[0]
+        header = json.loads(f.read(header_size))
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    data_start = 8 + header_size
+    tensors = {}
+    for name, info in header.items():
+        if name == '__metadata__':
+            continue
+        dtype = _SAFETENSORS_DTYPES[info['dtype']]
+        start, end = info['data_offsets']
+        if end == start:
+            tensors[name] = torch.empty(info['shape'], dtype=dtype)
+            continue
+        count = (end - start) // torch.empty((), dtype=dtype).element_size()
+        tensors[name] = torch.frombuffer(buffer, dtype=dtype, count=count, offset=data_start + start).view(info['shape'])
+    return tensors
+
+
+def _local_model_dir(name_or_path):
+    if os.path.isdir(name_or_path):
+        return name_or_path
+    from huggingface_hub import snapshot_download
+    return snapshot_download(name_or_path, allow_patterns=['*.json', '*.safetensors'])
+
+
+def _from_pretrained_mmap(model_cls, name_or_path):
+    """Builds the model without initializing it and points its weights at the mapped files."""
+    from transformers import AutoConfig
+
+    directory = _local_model_dir(name_or_path)
+    files = sorted(glob.glob(os.path.join(directory, '*.safetensors')))
+    if not files:
+        print(f"No safetensors weights for {name_or_path}; loading it without mmap.")
+        return None
+    state = {}
+    for path in files:
+        state.update(mmap_safetensors(path))
+
+    config = AutoConfig.from_pretrained(directory)
+    with _no_init_weights():
+        model = model_cls.from_config(config) if hasattr(model_cls, 'from_config') else model_cls(config)
+    result = model.load_state_dict(state, strict=False, assign=True)
+    model.tie_weights()
+
+    # Every parameter must now come from the file, directly or through weight tying.
+    mapped = {tensor.data_ptr() for tensor in state.values()}
+    parameters = dict(model.named_parameters(remove_duplicate=False))
+    unloaded = [key for key in result.missing_keys if key in parameters and parameters[key].data_ptr() not in mapped]
+    if unloaded or result.unexpected_keys:
+        print(f"Checkpoint keys of {name_or_path} do not match the model; loading it without mmap.")
+        return None
+    model.mmap_bytes = sum(
+        p.numel() * p.element_size() for p in _unique_tensors(model.parameters()) if p.data_ptr() in mapped
+    )
+    return model
+
+
+def load_sequence_classifier(name_or_path, dtype='fp32', use_mmap=False, model_cls=None):
+    """
+    Loads a sequence-classification model in fp32, bf16 or with dynamically int8-quantized
+    Linear layers. With use_mmap, fp32 weights stay memory-mapped; bf16 and int8 convert them,
+    so mmap then only lowers the peak while loading.
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f'Unknown model dtype "{dtype}". Choose one of: {", ".join(DTYPES)}')
+    if model_cls is None:
+        from transformers import AutoModelForSequenceClassification
+        model_cls = AutoModelForSequenceClassification
+
+    model = _from_pretrained_mmap(model_cls, name_or_path) if use_mmap else None
+    if model is None:
+        model = model_cls.from_pretrained(
+            name_or_path, torch_dtype=torch.bfloat16 if dtype == 'bf16' else torch.float32, low_cpu_mem_usage=True,
+        )
+    elif dtype == 'bf16':
+        model = model.to(torch.bfloat16)
+        model.mmap_bytes = 0
+    if dtype == 'int8':
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        model.mmap_bytes = 0
+    return model.eval()
+
+
+# --- Reports ---
+def _unique_tensors(tensors):
+    seen = set()
+    for tensor in tensors:
+        if tensor.data_ptr() not in seen:
+            seen.add(tensor.data_ptr())
+            yield tensor
+
+
+def module_memory(module):
+    """Bytes held by a module's weights and buffers (tied weights counted once), and their dtypes."""
+    if module is None:
+        return None
+    total = 0
+    dtypes = set()
+    for tensor in _unique_tensors(list(module.parameters()) + list(module.buffers())):
+        total += tensor.numel() * tensor.element_size()
+        dtypes.add(str(tensor.dtype).replace('torch.', ''))
+    # Dynamically quantized Linear layers keep their packed int8 weights outside parameters().
+    for submodule in module.modules():
+        packed = getattr(submodule, '_packed_params', None)
+        if packed is not None and hasattr(packed, '_weight_bias'):
+            weight, bias = packed._weight_bias()
+            total += weight.numel() * weight.element_size()
+            if bias is not None:
+                total += bias.numel() * bias.element_size()
+            dtypes.add('qint8')
+    return {
+        'parameter_bytes': total,
+        'mmap_bytes': getattr(module, 'mmap_bytes', 0),
+        'dtypes': sorted(dtypes),
+    }
+
+
+def process_memory():
+    """Resident memory of this process. USS/PSS (shared pages split between processes) need psutil."""
+    try:
+        import psutil
+        info = psutil.Process().memory_full_info()
+        return {'rss_bytes': info.rss, 'uss_bytes': getattr(info, 'uss', None), 'pss_bytes': getattr(info, 'pss', None)}
+    except (ImportError, OSError, AttributeError):
+        pass
+    try:
+        with open('/proc/self/statm') as f:
+            return {'rss_bytes': int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')}
+    except (OSError, ValueError):
+        import resource
+        return {'rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+
+
+def release_memory():
+    """Returns freed heap memory to the OS after a model is dropped (glibc only)."""
+    import ctypes
+    import gc
+
+    gc.collect()
+    try:
+        ctypes.CDLL('libc.so.6').malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
@@ -0,0 +1,212 @@
+import threading
+import time
+
+from model_memory import process_memory, release_memory
+
+
+class ModelUnavailable(RuntimeError):
+    """Raised when a model is still loading or failed to load."""
+
+
+class ModelSlot:
+    """
+    Holds one lazily loaded model together with its load state and load time.
+
+    The model is loaded on first use, or ahead of time by `start_warmup`. States are
+    'not_loaded', 'loading', 'ready', 'unloaded' and 'failed'. A failed load is retried on the
+    next use once `retry_seconds` have passed, instead of taking the whole process down.
+
+    To save memory a slot can be unloaded, by the idle reaper after `idle_unload_seconds`
+    without use or by a MemoryBudget; the next `get()` reloads it transparently. `sizer(model)`
+    describes the loaded model's memory for reports. Unloading a slot also unloads its
+    `dependents` (slots whose models hold a reference to this one).
+    """
+
+    def __init__(self, name, loader, retry_seconds=30, idle_unload_seconds=None, sizer=None):
+        self.name = name
+        self.loader = loader
+        self.retry_seconds = retry_seconds
+        self.idle_unload_seconds = idle_unload_seconds or None
+        self.sizer = sizer
+        self.budget = None
+        self.dependents = []
+        self.state = 'not_loaded'
+        self.error = None
+        self.load_seconds = None
+        self.loaded_at = None
+        self.last_used = None
+        self.loads = 0
+        self.unloads = 0
+        self.memory = None
+        self.load_rss_delta = None
+        # (model,) while loaded, else None; swapped as a whole so get() can read it without the lock.
+        self._loaded = None
+        self._failed_at = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Loads the model if needed (blocking) and returns it."""
+        with self._lock:
+            if self._loaded is not None:
+                return self._loaded[0]
+            if self.state == 'failed' and time.monotonic() - self._failed_at < self.retry_seconds:
+                raise ModelUnavailable(f"Model '{self.name}' failed to load: {self.error}")
+
+            print(f"Loading model '{self.name}'...")
+            self.state = 'loading'
+            started = time.monotonic()
+            rss_before = process_memory()['rss_bytes']
+            try:
+                value = self.loader()
+            except Exception as e:
+                self.state = 'failed'
+                self.error = str(e)
+                self._failed_at = time.monotonic()
+                print(f"Error loading model '{self.name}': {e}")
+                raise ModelUnavailable(f"Model '{self.name}' failed to load: {e}") from e
+            self.load_seconds = time.monotonic() - started
+            self.load_rss_delta = process_memory()['rss_bytes'] - rss_before
+            self.loaded_at = time.time()
+            self.last_used = time.monotonic()
+            self.loads += 1
+            self.error = None
+            self.memory = self._describe(value)
+            self._loaded = (value,)
+            self.state = 'ready'
+            print(f"Model '{self.name}' loaded in {self.load_seconds:.1f}s.")
+        if self.budget is not None:
+            self.budget.enforce(keep=self)
+        return value
+
+    def _describe(self, value):
+        if self.sizer is None or value is None:
+            return None
+        try:
+            return self.sizer(value)
+        except Exception as e:
+            print(f"Could not measure the memory of model '{self.name}': {e}")
+            return None
+
+    def unload(self, reason='requested'):
+        """Drops the model so its memory can be reclaimed; the next get() reloads it."""
+        with self._lock:
+            if self.state != 'ready':
+                return False
+            self._loaded = None
+            self.memory = None
+            self.state = 'unloaded'
+            self.unloads += 1
+        print(f"Model '{self.name}' unloaded ({reason}).")
+        for dependent in self.dependents:
+            dependent.unload(reason=f"'{self.name}' was unloaded")
+        release_memory()
+        return True
+
+    def idle_seconds(self):
+        if self.last_used is None or self.state != 'ready':
+            return None
+        return time.monotonic() - self.last_used
+
+    def get(self, wait=True):
+        """
+        Returns the loaded model. With wait=False, raises ModelUnavailable instead of
+        blocking while another thread (e.g. the warm-up thread) is still loading it for the
+        first time. Reloads after an unload are always waited for.
+        """
+        self.last_used = time.monotonic()
+        # A single read: a concurrent unload() cannot leave us with a half-dropped model.
+        loaded = self._loaded
+        if loaded is not None:
+            return loaded[0]
+        if not wait and self.state == 'loading' and not self.loads:
+            raise ModelUnavailable(f"Model '{self.name}' is still loading.")
+        return self.load()
+
+    @property
+    def ready(self):
+        return self.state == 'ready'
+
+    @property
+    def available(self):
+        """Ready, or unloaded to save memory and reloaded on the next use."""
+        return self.state in ('ready', 'unloaded')
+
+    def status(self):
+        idle = self.idle_seconds()
+        return {
+            'state': self.state,
+            'load_seconds': round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            'loaded_at': self.loaded_at,
+            'idle_seconds': round(idle, 1) if idle is not None else None,
+            'loads': self.loads,
+            'unloads': self.unloads,
+            'error': self.error,
+        }
+
+    def memory_report(self):
+        return dict(
+            self.memory or {},
+            state=self.state,
+            load_rss_delta_bytes=self.load_rss_delta,
+            idle_unload_seconds=self.idle_unload_seconds,
+        )
+
+
+class MemoryBudget:
+    """
+    Keeps the weights of the given slots under `max_bytes` by unloading the least recently
+    used ready slots (never the one that was just loaded) whenever a load goes over budget.
+    """
+
+    def __init__(self, slots, max_bytes):
+        self.slots = list(slots)
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        for slot in self.slots:
+            slot.budget = self
+
+    def used_bytes(self):
+        return sum(
+            slot.memory['parameter_bytes'] - slot.memory.get('mmap_bytes', 0)
+            for slot in self.slots if slot.ready and slot.memory
+        )
+
+    def enforce(self, keep=None):
+        candidates = sorted(
+            (slot for slot in self.slots if slot.ready and slot is not keep and slot.memory),
+            key=lambda slot: slot.last_used or 0,
+        )
+        for slot in candidates:
+            if self.used_bytes() <= self.max_bytes:
+                break
+            if slot.unload(reason='memory budget'):
+                self.evictions += 1
+
+
+def start_idle_reaper(slots, interval=30):
+    """Unloads slots that have been idle longer than their idle_unload_seconds, in a background thread."""
+    def reap():
+        while True:
+            time.sleep(interval)
+            for slot in slots:
+                idle = slot.idle_seconds()
+                if slot.idle_unload_seconds and idle is not None and idle > slot.idle_unload_seconds:
+                    slot.unload(reason=f"idle for {idle:.0f}s")
+
+    thread = threading.Thread(target=reap, name="model-idle-reaper", daemon=True)
+    thread.start()
+    return thread
+
+
+def start_warmup(slots):
+    """Loads the given slots one after another in a background thread, in order."""
+    def warm():
+        for slot in slots:
+            try:
+                slot.load()
+            except ModelUnavailable:
+                pass
+
+    thread = threading.Thread(target=warm, name="model-warmup", daemon=True)
+    thread.start()
+    return thread
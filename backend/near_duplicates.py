@@ -0,0 +1,270 @@
+import re
+import time
+
+import numpy as np
+
+from caching import normalize_text, text_key
+from storage import SQLiteStore
+
+# --- Near-duplicate detection: byte shingles + MinHash + LSH banding ---
+# Every indexed review gets a MinHash signature. The signature is cut into bands and each band is
+# hashed to a bucket; reviews that share any bucket are candidates, and candidates whose estimated
+# Jaccard similarity reaches the threshold join the same cluster. Bucket lookups go through a
+# SQLite index, so finding a review's neighbours does not scan the stored reviews.
+
+_SHIFT_32 = np.uint64(32)
+_NON_WORD = re.compile(r'[^\w\s]+')
+_GOLDEN_64 = np.uint64(0x9E3779B97F4A7C15)
+
+
+def shingle_hashes(text, k=5):
+    """
+    32-bit hashes of the distinct k-byte shingles of the normalized text (case, punctuation and
+    spacing ignored). Each shingle is packed into an integer and mixed, all in numpy.
+    """
+    data = ' '.join(_NON_WORD.sub(' ', normalize_text(text)).split()).encode('utf-8')
+    if not data:
+        return np.empty(0, dtype=np.uint64)
+    data = np.frombuffer(data, dtype=np.uint8).astype(np.uint64)
+    if len(data) <= k:
+        windows = data[None, :]
+    else:
+        windows = np.lib.stride_tricks.sliding_window_view(data, k)
+    packed = np.zeros(len(windows), dtype=np.uint64)
+    for column in range(windows.shape[1]):
+        packed = (packed << np.uint64(8)) | windows[:, column]
+    # Fibonacci hashing: the high 32 bits of the product spread the packed shingles evenly.
+    return np.unique((packed * _GOLDEN_64) >> _SHIFT_32)
+
+
+class NearDuplicateIndex(SQLiteStore):
+    """
+    Persistent MinHash/LSH index that groups near-identical reviews into clusters.
+
+    With `bands` x `rows` = `num_perm`, two reviews become candidates with high probability once
+    their Jaccard similarity passes roughly (1 / bands) ** (1 / rows); candidates are then confirmed
+    against `threshold` using their signatures. Each cluster can remember the prediction made for
+    one of its members (tagged with the classifier's fingerprint), so the others can reuse it.
+    Reviews shorter than `min_chars` are too generic to cluster and are not indexed, and at most
+    `max_candidates` bucket neighbours are verified per review, so crowded buckets stay cheap.
+    Batches are written `write_batch_size` reviews per transaction, so concurrent writers (other
+    threads, or other worker processes sharing the file) interleave instead of queueing.
+    """
+
+    label = 'Near-duplicate index'
+    autocommit = True
+
+    def __init__(self, db_path, num_perm=128, bands=32, threshold=0.7, min_chars=40, shingle_size=5,
+                 max_candidates=500, write_batch_size=200, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.min_chars = min_chars
+        self.shingle_size = shingle_size
+        self.max_candidates = max_candidates
+        self.write_batch_size = max(1, int(write_batch_size))
+        # Multiply-shift hashing: one random odd 64-bit multiplier per permutation.
+        rng = np.random.RandomState(seed)
+        self._multipliers = rng.randint(0, 2 ** 63, size=(num_perm, 1), dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._band_multipliers = rng.randint(0, 2 ** 63, size=self.rows, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._band_offsets = rng.randint(0, 2 ** 63, size=bands, dtype=np.uint64) * np.uint64(2)
+        self.lookups = 0
+        self.indexed = 0
+        self.matched = 0
+        super().__init__(db_path)
+
+    def _setup(self):
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS clusters ("
+            " id INTEGER PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " prediction TEXT,"
+            " confidence REAL,"
+            " model TEXT);"
+            "CREATE TABLE IF NOT EXISTS docs ("
+            " id INTEGER PRIMARY KEY,"
+            " text_key TEXT NOT NULL UNIQUE,"
+            " cluster_id INTEGER NOT NULL,"
+            " signature BLOB NOT NULL,"
+            " source TEXT NOT NULL,"
+            " created_at REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS docs_cluster ON docs (cluster_id);"
+            "CREATE TABLE IF NOT EXISTS buckets (bucket INTEGER NOT NULL, doc_id INTEGER NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS buckets_bucket ON buckets (bucket);"
+        )
+
+    # --- Signatures ---
+    def signature(self, text):
+        """MinHash signature (uint32 array of length num_perm), or None if the text is too short."""
+        if len(text.strip()) < self.min_chars:
+            return None
+        hashes = shingle_hashes(text, self.shingle_size)
+        if not len(hashes):
+            return None
+        # The high 32 bits are the hash; taking them after the min gives the same result, cheaper.
+        return ((self._multipliers * hashes).min(axis=1) >> _SHIFT_32).astype(np.uint32)
+
+    def _bucket_keys(self, signature):
+        """One signed 64-bit bucket key per band (a random linear hash of the band's values)."""
+        bands = signature.reshape(self.bands, self.rows).astype(np.uint64)
+        keys = (bands * self._band_multipliers).sum(axis=1) + self._band_offsets
+        return keys.view(np.int64).tolist()
+
+    # --- Index updates ---
+    def _find_matches(self, signature, bucket_keys):
+        placeholders = ','.join('?' * len(bucket_keys))
+        candidates = self._conn.execute(
+            f"SELECT DISTINCT d.id, d.cluster_id, d.signature FROM buckets b JOIN docs d ON d.id = b.doc_id"
+            f" WHERE b.bucket IN ({placeholders}) LIMIT ?", bucket_keys + [self.max_candidates]
+        ).fetchall()
+        if not candidates:
+            return set()
+        signatures = np.frombuffer(b''.join(blob for _, _, blob in candidates), dtype=np.uint32).reshape(-1, self.num_perm)
+        similarities = np.count_nonzero(signatures == signature, axis=1) / self.num_perm
+        return {candidates[i][1] for i in np.flatnonzero(similarities >= self.threshold)}
+
+    def _merge(self, cluster_ids):
+        """Merges clusters into the oldest one, which keeps its prediction. Returns the surviving id."""
+        root, others = min(cluster_ids), sorted(cluster_ids - {min(cluster_ids)})
+        if others:
+            placeholders = ','.join('?' * len(others))
+            moved = self._conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM clusters WHERE id IN ({placeholders})", others).fetchone()[0]
+            self._conn.execute(f"UPDATE docs SET cluster_id = ? WHERE cluster_id IN ({placeholders})", [root] + others)
+            self._conn.execute(f"DELETE FROM clusters WHERE id IN ({placeholders})", others)
+            self._conn.execute("UPDATE clusters SET size = size + ? WHERE id = ?", (moved, root))
+        return root
+
+    def _prepare(self, text):
+        """(signature, bucket keys) for a text, or None if it is too short to index."""
+        signature = self.signature(text)
+        return None if signature is None else (signature, self._bucket_keys(signature))
+
+    def _existing_keys(self, keys):
+        found = set()
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            found.update(row[0] for row in self._conn.execute(f"SELECT text_key FROM docs WHERE text_key IN ({placeholders})", chunk))
+        return found
+
+    def _add_one(self, text, key, prepared, source, now):
+        row = self._conn.execute("SELECT id FROM docs WHERE text_key = ?", (key,)).fetchone()
+        if row is not None:
+            return row[0]
+        if key not in prepared:
+            # Indexed when the batch started, but cleared since.
+            prepared[key] = self._prepare(text)
+        if prepared[key] is None:
+            return None
+        signature, bucket_keys = prepared[key]
+        matches = self._find_matches(signature, bucket_keys)
+        if matches:
+            self.matched += 1
+            cluster_id = self._merge(matches)
+            self._conn.execute("UPDATE clusters SET size = size + 1 WHERE id = ?", (cluster_id,))
+        else:
+            cluster_id = self._conn.execute("INSERT INTO clusters (size) VALUES (1)").lastrowid
+        doc_id = self._conn.execute(
+            "INSERT INTO docs (text_key, cluster_id, signature, source, created_at) VALUES (?, ?, ?, ?, ?)",
+            (key, cluster_id, signature.tobytes(), source, now),
+        ).lastrowid
+        self._conn.executemany("INSERT INTO buckets VALUES (?, ?)", [(bucket, doc_id) for bucket in bucket_keys])
+        self.indexed += 1
+        return doc_id
+
+    def add_many(self, texts, source, model=None):
+        """
+        Indexes texts (exact repeats are only stored once) and returns, per text,
+        (cluster_id, cluster_size, prediction) after the whole batch is indexed. `prediction` is the
+        cluster's stored (label, confidence) if it was made by `model`, else None. Texts that are
+        too short to index get (None, 1, None).
+        """
+        now = time.time()
+        keys = [text_key(text) for text in texts]
+        texts_by_key = dict(zip(keys, texts))
+        with self._lock:
+            self.lookups += len(texts)
+            existing = self._existing_keys(list(texts_by_key))
+        # Signatures are the expensive part, so they are computed before taking any lock.
+        prepared = {key: self._prepare(text) for key, text in texts_by_key.items() if key not in existing}
+
+        doc_ids = []
+        for start in range(0, len(texts), self.write_batch_size):
+            with self._lock:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    doc_ids.extend(
+                        self._add_one(text, key, prepared, source, now)
+                        for text, key in zip(texts[start:start + self.write_batch_size], keys[start:start + self.write_batch_size])
+                    )
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    self._conn.execute("ROLLBACK")
+                    raise
+
+        with self._lock:
+            # Clusters may have merged while the batch was indexed, so resolve them at the end.
+            known = [doc_id for doc_id in set(doc_ids) if doc_id is not None]
+            resolved = {}
+            for start in range(0, len(known), 500):
+                chunk = known[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                for doc_id, cluster_id, size, prediction, confidence, cluster_model in self._conn.execute(
+                    f"SELECT d.id, c.id, c.size, c.prediction, c.confidence, c.model FROM docs d"
+                    f" JOIN clusters c ON c.id = d.cluster_id WHERE d.id IN ({placeholders})", chunk
+                ):
+                    stored = (prediction, confidence) if prediction is not None and cluster_model == model else None
+                    resolved[doc_id] = (cluster_id, size, stored)
+        return [resolved[doc_id] if doc_id is not None else (None, 1, None) for doc_id in doc_ids]
+
+    def set_predictions(self, predictions, model):
+        """Stores {cluster_id: (label, confidence)} unless the cluster already has one from `model`."""
+        if not predictions:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "UPDATE clusters SET prediction = ?, confidence = ?, model = ?"
+                    " WHERE id = ? AND (model IS NULL OR model != ?)",
+                    [(label, confidence, model, cluster_id, model) for cluster_id, (label, confidence) in predictions.items()],
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def clear(self):
+        """Drops every indexed text and cluster."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM buckets")
+                self._conn.execute("DELETE FROM docs")
+                self._conn.execute("DELETE FROM clusters")
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def stats(self):
+        with self._lock:
+            docs = self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+            clusters, members = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM clusters WHERE size > 1"
+            ).fetchone()
+        return {
+            'db_path': self.db_path,
+            'threshold': self.threshold,
+            'bands': self.bands,
+            'rows_per_band': self.rows,
+            'docs': docs,
+            'duplicate_clusters': clusters,
+            'docs_in_duplicate_clusters': members,
+            'lookups': self.lookups,
+            'indexed': self.indexed,
+            'matched': self.matched,
+        }
@@ -0,0 +1,158 @@
+import time
+
+from caching import text_key
+from storage import SQLiteStore
+
+SENTIMENT_COLUMNS = {'positive feedback': 'positive', 'negative feedback': 'negative'}
+
+
+class ReviewStore(SQLiteStore):
+    """
+    Persistent hotels, their reviews and per-(hotel, aspect) sentiment counters in SQLite.
+
+    Reviews are stored first and annotated afterwards; recording a review's annotation bumps
+    its hotel's aspect counter in the same transaction, so a consensus lookup is a read of a
+    handful of rows and adding a review never rebuilds anything. `namespace` identifies the
+    zero-shot model and label set: when it changes, stored annotations and counters are dropped
+    and the reviews become pending again so they are re-annotated with the new labels.
+    """
+
+    label = 'Review store'
+
+    def __init__(self, db_path, namespace):
+        self.namespace = namespace
+        super().__init__(db_path)
+
+    def _setup(self):
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS hotels ("
+            " id INTEGER PRIMARY KEY,"
+            " name TEXT NOT NULL UNIQUE,"
+            " created_at REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS reviews ("
+            " id INTEGER PRIMARY KEY,"
+            " hotel_id INTEGER NOT NULL REFERENCES hotels(id),"
+            " text_key TEXT NOT NULL,"
+            " user TEXT,"
+            " review TEXT NOT NULL,"
+            " source TEXT NOT NULL,"
+            " aspect TEXT,"
+            " sentiment TEXT,"
+            " created_at REAL NOT NULL,"
+            " UNIQUE (hotel_id, text_key));"
+            "CREATE INDEX IF NOT EXISTS reviews_pending ON reviews (hotel_id) WHERE aspect IS NULL;"
+            "CREATE TABLE IF NOT EXISTS aspect_counts ("
+            " hotel_id INTEGER NOT NULL REFERENCES hotels(id),"
+            " aspect TEXT NOT NULL,"
+            " positive INTEGER NOT NULL DEFAULT 0,"
+            " negative INTEGER NOT NULL DEFAULT 0,"
+            " PRIMARY KEY (hotel_id, aspect));"
+        )
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'namespace'").fetchone()
+        if row is None or row[0] != self.namespace:
+            if row is not None:
+                print("Review store: annotation labels changed; reviews will be re-annotated.")
+            self._conn.execute("UPDATE reviews SET aspect = NULL, sentiment = NULL")
+            self._conn.execute("DELETE FROM aspect_counts")
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('namespace', ?)", (self.namespace,))
+        self._conn.commit()
+
+    def _hotel_id(self, name, create=False):
+        row = self._conn.execute("SELECT id FROM hotels WHERE name = ?", (name,)).fetchone()
+        if row is not None:
+            return row[0]
+        if not create:
+            return None
+        return self._conn.execute("INSERT INTO hotels (name, created_at) VALUES (?, ?)", (name, time.time())).lastrowid
+
+    def has_hotel(self, name):
+        with self._lock:
+            return self._hotel_id(name) is not None
+
+    def add_reviews(self, hotel_name, reviews, source='api'):
+        """
+        Stores reviews (dicts with 'review' and optional 'user') for a hotel, creating the hotel
+        if needed. Reviews the hotel already has are skipped. Returns [(review_id, text), ...]
+        for the new reviews, which still need annotating.
+        """
+        now = time.time()
+        added = []
+        with self._lock:
+            hotel_id = self._hotel_id(hotel_name, create=True)
+            for review in reviews:
+                text = review['review']
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO reviews (hotel_id, text_key, user, review, source, created_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (hotel_id, text_key(text), review.get('user'), text, source, now),
+                )
+                if cursor.rowcount:
+                    added.append((cursor.lastrowid, text))
+            self._conn.commit()
+        return added
+
+    def pending_reviews(self, hotel_name=None):
+        """[(review_id, text), ...] of reviews without an annotation, for one hotel or all of them."""
+        with self._lock:
+            if hotel_name is None:
+                rows = self._conn.execute("SELECT id, review FROM reviews WHERE aspect IS NULL").fetchall()
+            else:
+                hotel_id = self._hotel_id(hotel_name)
+                if hotel_id is None:
+                    return []
+                rows = self._conn.execute(
+                    "SELECT id, review FROM reviews WHERE hotel_id = ? AND aspect IS NULL", (hotel_id,)
+                ).fetchall()
+        return rows
+
+    def record_annotations(self, annotations):
+        """
+        Stores (review_id, aspect, sentiment) annotations and increments the matching counters.
+        A review that another thread annotated in the meantime is not counted twice.
+        """
+        with self._lock:
+            for review_id, aspect, sentiment in annotations:
+                cursor = self._conn.execute(
+                    "UPDATE reviews SET aspect = ?, sentiment = ? WHERE id = ? AND aspect IS NULL",
+                    (aspect, sentiment, review_id),
+                )
+                if not cursor.rowcount:
+                    continue
+                column = SENTIMENT_COLUMNS[sentiment]
+                self._conn.execute(
+                    f"INSERT INTO aspect_counts (hotel_id, aspect, {column})"
+                    f" SELECT hotel_id, ?, 1 FROM reviews WHERE id = ?"
+                    f" ON CONFLICT (hotel_id, aspect) DO UPDATE SET {column} = {column} + 1",
+                    (aspect, review_id),
+                )
+            self._conn.commit()
+
+    def consensus(self, hotel_name):
+        """Returns {aspect: (positive, negative)} for a hotel, or None if the hotel is unknown."""
+        with self._lock:
+            hotel_id = self._hotel_id(hotel_name)
+            if hotel_id is None:
+                return None
+            rows = self._conn.execute(
+                "SELECT aspect, positive, negative FROM aspect_counts WHERE hotel_id = ?", (hotel_id,)
+            ).fetchall()
+        return {aspect: (positive, negative) for aspect, positive, negative in rows}
+
+    def hotel_summary(self, hotel_name):
+        with self._lock:
+            hotel_id = self._hotel_id(hotel_name)
+            if hotel_id is None:
+                return None
+            total, pending = self._conn.execute(
+                "SELECT COUNT(*), COUNT(*) - COUNT(aspect) FROM reviews WHERE hotel_id = ?", (hotel_id,)
+            ).fetchone()
+        return {'hotel_name': hotel_name, 'reviews': total, 'pending_annotation': pending}
+
+    def stats(self):
+        with self._lock:
+            hotels = self._conn.execute("SELECT COUNT(*) FROM hotels").fetchone()[0]
+            reviews, pending = self._conn.execute(
+                "SELECT COUNT(*), COUNT(*) - COUNT(aspect) FROM reviews"
+            ).fetchone()
+        return {'db_path': self.db_path, 'hotels': hotels, 'reviews': reviews, 'pending_annotation': pending}
@@ -0,0 +1,102 @@
+import json
+import time
+from urllib.parse import urlsplit
+
+from storage import SQLiteStore
+
+
+def url_key(url):
+    """Identifies a hotel page by host and path; query strings (tracking, session ids) are ignored."""
+    parts = urlsplit(url.strip())
+    return f"{(parts.hostname or '').lower()}{parts.path.rstrip('/')}"
+
+
+class ScrapeCache(SQLiteStore):
+    """
+    The reviews last scraped from each URL, newest first, in SQLite so every worker shares them.
+
+    An entry younger than `ttl_seconds` is served without opening a browser. An older one is
+    refreshed incrementally: only reviews newer than the cached ones are scraped and put in front.
+    `complete` records that the scrape reached the end of the review list, so the entry holds
+    every review even if it has fewer than a later request asks for. `newest_first` records that
+    the reviews were scraped in that order, which incremental refreshes rely on. At most
+    `max_reviews` reviews (the newest) are kept per entry; an entry trimmed to that many is no
+    longer complete.
+    """
+
+    label = 'Scrape cache'
+
+    def __init__(self, db_path, ttl_seconds=3600, max_reviews=None):
+        self.ttl_seconds = ttl_seconds
+        self.max_reviews = max_reviews
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        super().__init__(db_path)
+
+    def _setup(self):
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS scrapes ("
+            " url_key TEXT PRIMARY KEY,"
+            " url TEXT NOT NULL,"
+            " reviews TEXT NOT NULL,"
+            " complete INTEGER NOT NULL,"
+            " fetched_at REAL NOT NULL,"
+            " newest_first INTEGER NOT NULL DEFAULT 0)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(scrapes)")}
+        if 'newest_first' not in columns:
+            # Entries from before the column existed were scraped in Booking's default order.
+            self._conn.execute("ALTER TABLE scrapes ADD COLUMN newest_first INTEGER NOT NULL DEFAULT 0")
+        self._conn.commit()
+
+    def get(self, url):
+        """Returns {'reviews', 'complete', 'newest_first', 'fetched_at', 'fresh'} for a URL, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT reviews, complete, newest_first, fetched_at FROM scrapes WHERE url_key = ?", (url_key(url),)
+            ).fetchone()
+        if row is None:
+            return None
+        reviews, complete, newest_first, fetched_at = row
+        return {
+            'reviews': json.loads(reviews),
+            'complete': bool(complete),
+            'newest_first': bool(newest_first),
+            'fetched_at': fetched_at,
+            'fresh': self.ttl_seconds <= 0 or time.time() - fetched_at < self.ttl_seconds,
+        }
+
+    def put(self, url, reviews, complete, newest_first=False):
+        if self.max_reviews and len(reviews) > self.max_reviews:
+            reviews, complete = reviews[:self.max_reviews], False
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO scrapes (url_key, url, reviews, complete, fetched_at, newest_first)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (url_key(url), url, json.dumps(reviews), int(complete), time.time(), int(newest_first)),
+            )
+            self._conn.commit()
+
+    def record(self, outcome):
+        """Counts how a scrape was served: 'hit', 'miss' or 'refresh'."""
+        with self._lock:
+            if outcome == 'hit':
+                self.hits += 1
+            elif outcome == 'refresh':
+                self.refreshes += 1
+            else:
+                self.misses += 1
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM scrapes").fetchone()[0]
+            return {
+                'db_path': self.db_path,
+                'ttl_seconds': self.ttl_seconds,
+                'max_reviews': self.max_reviews,
+                'entries': entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'refreshes': self.refreshes,
+            }
@@ -1,4 +1,3 @@
-import time
 import os
 import pandas as pd
 from selenium import webdriver
@@ -6,36 +5,111 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
-from bs4 import BeautifulSoup
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
+from bs4 import BeautifulSoup, SoupStrainer
 from selenium_stealth import stealth
+from metrics import stage
 
-def scrape_booking_reviews(url, max_reviews=50):
+REVIEW_CARD_SELECTOR = 'div[data-testid="review-card"]'
+REVIEW_TITLE_SELECTOR = 'h4[data-testid="review-title"]'
+NEXT_PAGE_SELECTOR = 'button[aria-label="Next page"]'
+LOADING_SPINNER_SELECTOR = 'div[data-testid="reviews-list-loading-spinner"]'
+SORT_TRIGGER_SELECTOR = 'button[data-testid="sorters-dropdown-trigger"]'
+NEWEST_FIRST_SELECTOR = '[data-id="NEWEST_FIRST"]'
+# Consecutive already-seen reviews an incremental refresh needs before it stops. A single match
+# proves little: generic titles such as "Excellent" repeat across many reviews.
+STOP_AFTER_KNOWN = 5
+
+# Runs in the browser and returns only the review titles, so the page never has to be
+# serialized and re-parsed in Python. Missing titles come back as null.
+EXTRACT_TITLES_JS = """
+return Array.from(document.querySelectorAll(arguments[0])).map(function (card) {
+    var title = card.querySelector(arguments[1]);
+    return title ? title.textContent.trim() : null;
+});
+"""
+
+# A cheap fingerprint of the review list, used to detect when pagination has rendered new cards.
+REVIEW_LIST_SIGNATURE_JS = """
+var cards = document.querySelectorAll(arguments[0]);
+return cards.length + '|' + (cards.length ? cards[0].textContent : '');
+"""
+
+
+def parse_review_titles(html):
     """
-    Scrapes reviews for a given Booking.com hotel URL with stealth capabilities.
+    Extracts review titles from saved or serialized HTML. Only the review-card fragments are
+    built into a tree (via SoupStrainer) and parsing uses the C-based lxml parser.
+    """
+    cards_only = SoupStrainer('div', attrs={'data-testid': 'review-card'})
+    soup = BeautifulSoup(html, 'lxml', parse_only=cards_only)
+    titles = []
+    for card in soup.select(REVIEW_CARD_SELECTOR):
+        title_element = card.select_one(REVIEW_TITLE_SELECTOR)
+        titles.append(title_element.get_text(strip=True) if title_element else None)
+    return titles
+
+
+def extract_review_titles(driver):
+    """Returns the titles of the review cards currently rendered in the browser."""
+    return driver.execute_script(EXTRACT_TITLES_JS, REVIEW_CARD_SELECTOR, REVIEW_TITLE_SELECTOR)
+
+
+def _review_list_signature(driver):
+    return driver.execute_script(REVIEW_LIST_SIGNATURE_JS, REVIEW_CARD_SELECTOR)
+
+
+def sort_reviews_newest_first(driver, before_request=None, timeout=5):
     """
-    print("Initializing browser in stealth mode...")
+    Switches the open reviews panel from Booking's default "Most relevant" order to "Newest first".
+    Returns False if the sort control could not be found or used.
+    """
+    wait = WebDriverWait(driver, timeout)
     try:
-        service = Service()
-        options = webdriver.ChromeOptions()
-        options = webdriver.ChromeOptions()
-        
-        # --- ADD THESE LINES FOR RENDER DEPLOYMENT ---
-        # This tells Selenium where to find the Chromium browser on the server
-        options.binary_location = "/usr/bin/chromium"
-        options.add_argument("--headless") 
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-dev-shm-usage")
-        # ---------------------------------------------
-
-        # options.add_argument("start-maximized") # You can remove or comment this out for server
-        # --- STEALTH OPTIONS ---
-        options.add_argument("start-maximized")
-        options.add_experimental_option("excludeSwitches", ["enable-automation"])
-        options.add_experimental_option('useAutomationExtension', False)
-        # To run without a visible browser, uncomment the line below
-        # options.add_argument('--headless')
-        
+        with stage('scrape_sort_reviews'):
+            trigger = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, SORT_TRIGGER_SELECTOR)))
+            driver.execute_script("arguments[0].click();", trigger)
+            option = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, NEWEST_FIRST_SELECTOR)))
+            previous_signature = _review_list_signature(driver)
+            if before_request is not None:
+                before_request()
+            driver.execute_script("arguments[0].click();", option)
+            WebDriverWait(driver, 20).until(EC.invisibility_of_element_located((By.CSS_SELECTOR, LOADING_SPINNER_SELECTOR)))
+            try:
+                wait.until(lambda d: _review_list_signature(d) != previous_signature)
+            except TimeoutException:
+                pass  # The list may already have been in this order.
+    except WebDriverException as e:
+        print(f"Could not sort the reviews newest first: {e}")
+        return False
+    print("Sorted the reviews newest first.")
+    return True
+
+
+def create_driver():
+    """
+    Launches a headless Chromium with stealth settings applied.
+    """
+    service = Service()
+    options = webdriver.ChromeOptions()
+    
+    # --- ADD THESE LINES FOR RENDER DEPLOYMENT ---
+    # This tells Selenium where to find the Chromium browser on the server
+    options.binary_location = "/usr/bin/chromium"
+    options.add_argument("--headless") 
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    # ---------------------------------------------
+
+    # options.add_argument("start-maximized") # You can remove or comment this out for server
+    # --- STEALTH OPTIONS ---
+    options.add_argument("start-maximized")
+    options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    options.add_experimental_option('useAutomationExtension', False)
+    # To run without a visible browser, uncomment the line below
+    # options.add_argument('--headless')
+    
+    with stage('scrape_driver_launch'):
         driver = webdriver.Chrome(service=service, options=options)
         
         # --- Configure Stealth ---
@@ -47,20 +121,68 @@ def scrape_booking_reviews(url, max_reviews=50):
                 renderer="Intel Iris OpenGL Engine",
                 fix_hairline=True,
                 )
+    return driver
+
 
-    except Exception as e:
-        print(f"Error: ChromeDriver setup failed. Details: {e}")
-        return pd.DataFrame()
+def iter_booking_review_pages(url, max_reviews=50, driver=None, stop_at=None, before_request=None,
+                              stop_after=STOP_AFTER_KNOWN, summary=None):
+    """
+    Scrapes reviews for a given Booking.com hotel URL with stealth capabilities, yielding
+    the new unique reviews of each page (a list of {'review': ...} dicts) as soon as it is read.
+    Reviews are sorted newest first when the page allows it.
+    If a driver is passed in (e.g. leased from a DriverPool) it is reused and left open;
+    otherwise a fresh browser is launched and closed again when scraping is done.
 
-    driver.get(url)
+    For incremental refreshes, `stop_at` is a set of reviews already seen: scraping stops once
+    `stop_after` of them come in a row, so only the pages with newer reviews are loaded. If the list cannot be sorted newest first, `stop_at` is ignored and everything is
+    scraped. `before_request()` is called before every page load, e.g. to rate-limit requests to
+    the site. `summary`, if given, receives 'newest_first', 'stopped_at_known' and 'reached_end',
+    which is only set when the last page of reviews was reached (not after a timeout or an error).
+    """
+    owns_driver = driver is None
+    if owns_driver:
+        print("Initializing browser in stealth mode...")
+        try:
+            driver = create_driver()
+        except Exception as e:
+            print(f"Error: ChromeDriver setup failed. Details: {e}")
+            return
+
+    try:
+        yield from _iter_pages_with_driver(
+            driver, url, max_reviews, stop_at or set(), before_request, stop_after, summary if summary is not None else {},
+        )
+    finally:
+        if owns_driver:
+            driver.quit()
+
+
+def scrape_booking_reviews(url, max_reviews=50, driver=None):
+    """
+    Scrapes reviews for a given Booking.com hotel URL with stealth capabilities.
+    Returns all scraped reviews as a DataFrame with a 'review' column.
+    """
+    scraped_data = []
+    for page_reviews in iter_booking_review_pages(url, max_reviews=max_reviews, driver=driver):
+        scraped_data.extend(page_reviews)
+    return pd.DataFrame(scraped_data)
+
+
+def _iter_pages_with_driver(driver, url, max_reviews, stop_at, before_request, stop_after, summary):
+    summary.update(newest_first=False, stopped_at_known=False, reached_end=False)
+    if before_request is not None:
+        before_request()
+    with stage('scrape_page_load'):
+        driver.get(url)
     wait = WebDriverWait(driver, 20) 
 
     # --- 2. Handle Pop-ups (Cookies) ---
     try:
-        accept_button = wait.until(EC.element_to_be_clickable((By.ID, 'onetrust-accept-btn-handler')))
-        accept_button.click()
-        print("Accepted cookie policy.")
-        time.sleep(1)
+        with stage('scrape_cookie_banner'):
+            accept_button = wait.until(EC.element_to_be_clickable((By.ID, 'onetrust-accept-btn-handler')))
+            accept_button.click()
+            print("Accepted cookie policy.")
+            wait.until(EC.invisibility_of_element_located((By.ID, 'onetrust-accept-btn-handler')))
     except TimeoutException:
         print("Cookie banner not found or already accepted.")
 
@@ -69,28 +191,33 @@ def scrape_booking_reviews(url, max_reviews=50):
         reviews_tab_id = 'reviews-tab-trigger'
         print("Waiting for the reviews tab to be clickable...")
         
-        reviews_button = wait.until(EC.element_to_be_clickable((By.ID, reviews_tab_id)))
-        
-        print("Reviews tab is clickable. Scrolling and clicking...")
-        driver.execute_script("arguments[0].scrollIntoView(true);", reviews_button)
-        time.sleep(0.5)
-        driver.execute_script("arguments[0].click();", reviews_button)
+        with stage('scrape_open_reviews'):
+            reviews_button = wait.until(EC.element_to_be_clickable((By.ID, reviews_tab_id)))
+            
+            print("Reviews tab is clickable. Scrolling and clicking...")
+            driver.execute_script("arguments[0].scrollIntoView(true);", reviews_button)
+            driver.execute_script("arguments[0].click();", reviews_button)
         
         print("Successfully opened the reviews panel.")
 
     except TimeoutException as e:
         print(f"Could not find or click the reviews tab with ID '{reviews_tab_id}'. The page structure may have changed. Error: {e}")
-        driver.quit()
-        return pd.DataFrame()
+        return
 
     # --- 4. Wait for Review Content to be Visible ---
     try:
-        wait.until(EC.visibility_of_element_located((By.CSS_SELECTOR, 'div[data-testid="review-card"]')))
+        with stage('scrape_reviews_visible'):
+            wait.until(EC.visibility_of_element_located((By.CSS_SELECTOR, REVIEW_CARD_SELECTOR)))
         print("Review content is now visible.")
     except TimeoutException:
         print("Review content did not load after clicking the button.")
-        driver.quit()
-        return pd.DataFrame()
+        return
+
+    # Stopping at known reviews is only safe when the newest ones come first.
+    summary['newest_first'] = sort_reviews_newest_first(driver, before_request)
+    if stop_at and not summary['newest_first']:
+        print("Scraping every page instead of stopping at reviews seen in an earlier scrape.")
+        stop_at = set()
         
     # --- 5. Scrape Reviews with Pagination ---
     scraped_data = []
@@ -98,57 +225,77 @@ def scrape_booking_reviews(url, max_reviews=50):
     print(f"Starting to scrape up to {max_reviews} reviews...")
     
     page_count = 1
+    known_run = 0
     while len(scraped_data) < max_reviews:
         print(f"Scraping page {page_count}...")
         
-        time.sleep(2) 
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
-        
-        review_cards = soup.select('div[data-testid="review-card"]')
-        if not review_cards:
+        with stage('scrape_page_extract'):
+            review_titles = extract_review_titles(driver)
+        if not review_titles:
             print("Could not find review cards on the page. Ending scrape.")
             break
 
-        new_reviews_found_on_page = 0
-        for card in review_cards:
+        page_reviews = []
+        reached_seen = False
+        for review_title in review_titles:
             if len(scraped_data) >= max_reviews:
                 break
             
             # Scrape only the title using the data-testid you provided
-            title_element = card.select_one('h4[data-testid="review-title"]')
-            review_title = title_element.get_text(strip=True) if title_element else "No Title"
+            untitled = not review_title
+            review_title = review_title or "No Title"
 
             # Avoid duplicate reviews based on the title text
             if review_title and review_title not in unique_reviews:
                 unique_reviews.add(review_title)
                 # Append a dictionary with the 'review' key as requested
                 scraped_data.append({'review': review_title})
-                new_reviews_found_on_page += 1
-            # --- MODIFICATION END ---
+                page_reviews.append({'review': review_title})
 
-        print(f"Found {new_reviews_found_on_page} new unique reviews on this page.")
+            # Untitled cards say nothing about whether a review was seen before.
+            if stop_at and not untitled:
+                known_run = known_run + 1 if review_title in stop_at else 0
+                if known_run >= stop_after:
+                    reached_seen = True
+                    break
+
+        print(f"Found {len(page_reviews)} new unique reviews on this page.")
+        if page_reviews:
+            yield page_reviews
         if len(scraped_data) >= max_reviews:
             print(f"Reached the target of {max_reviews} reviews.")
             break
+        if reached_seen:
+            print(f"Reached {stop_after} reviews in a row seen in an earlier scrape.")
+            summary['stopped_at_known'] = True
+            break
 
         try:
-            next_page_button = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, 'button[aria-label="Next page"]')))
-            driver.execute_script("arguments[0].click();", next_page_button)
+            # Check for the button directly instead of waiting out the full timeout on the last page.
+            next_page_buttons = driver.find_elements(By.CSS_SELECTOR, NEXT_PAGE_SELECTOR)
+            if not next_page_buttons or not next_page_buttons[0].is_enabled():
+                print("Next page button not found or not clickable. Reached the end.")
+                summary['reached_end'] = True
+                break
+            previous_signature = _review_list_signature(driver)
+            if before_request is not None:
+                before_request()
+            driver.execute_script("arguments[0].click();", next_page_buttons[0])
             page_count += 1
             print("Navigating to next page...")
-            wait.until(EC.invisibility_of_element_located((By.CSS_SELECTOR, 'div[data-testid="reviews-list-loading-spinner"]')))
+            # Instead of a fixed sleep, wait until the spinner is gone and the review list has changed.
+            with stage('scrape_pagination_wait'):
+                wait.until(EC.invisibility_of_element_located((By.CSS_SELECTOR, LOADING_SPINNER_SELECTOR)))
+                wait.until(lambda d: _review_list_signature(d) != previous_signature)
         except TimeoutException:
-            print("Next page button not found or not clickable. Reached the end.")
+            print("The review list did not change after paging. Ending scrape.")
             break
         except Exception as e:
             print(f"An error occurred during pagination: {e}")
             break
 
-    # --- 6. Clean up and return data ---
-    driver.quit()
+    # --- 6. Done ---
     print(f"\nScraping complete. Total unique reviews collected: {len(scraped_data)}")
-    
-    return pd.DataFrame(scraped_data)
 
 # --- Example Usage ---
 if __name__ == '__main__':
@@ -0,0 +1,53 @@
+import os
+import sqlite3
+import threading
+
+
+class SQLiteStore:
+    """
+    Base for the SQLite files under ./cache that every worker on the host shares.
+
+    Subclasses create their schema in `_setup()` and set their attributes before calling
+    `SQLiteStore.__init__`. If the file cannot be opened (e.g. on a read-only filesystem) the
+    store falls back to an in-memory database, or to no connection at all when
+    `memory_fallback` is False. With `autocommit`, transactions are opened explicitly.
+    """
+
+    label = 'SQLite store'
+    autocommit = False
+    memory_fallback = True
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._open()
+
+    def _connect(self, path):
+        if self.autocommit:
+            return sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        return sqlite3.connect(path, timeout=30, check_same_thread=False)
+
+    def _open(self):
+        try:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = self._connect(self.db_path)
+            self._setup()
+            return
+        except (sqlite3.Error, OSError) as e:
+            fallback = 'using an in-memory database' if self.memory_fallback else 'keeping it in memory only'
+            print(f"{self.label}: cannot open {self.db_path} ({e}); {fallback}.")
+        self._conn = None
+        if self.memory_fallback:
+            self._conn = self._connect(':memory:')
+            self._setup()
+
+    def _setup(self):
+        """Creates the schema on a new connection."""
+
+    def reopen(self):
+        """Opens a fresh connection, e.g. in a worker forked from a process that already had one."""
+        self._lock = threading.Lock()
+        self._open()